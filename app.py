@@ -1,20 +1,201 @@
-from dsl import run_pipeline
+import logging
+import os
+import socket
+import threading
 
-from flask import Flask, request, jsonify, abort
+from dsl import (Budget, CancelToken, Cancelled, PipelineAborted,
+                 run_pipeline, run_batch, explain_pipeline, cache_stats)
+
+from flask import Flask, Response, request, jsonify, abort
 from flask_cors import CORS, cross_origin
 from flask.helpers import send_from_directory
 
 from dsl_supporter import dfs
+from result_encoding import encode_results, to_jsonable
+from jobs import JobQueue, QueueFull
 from find_divisions import find_divisions_from_dsl, find_division_from_id_and_house
 
 app = Flask(__name__)
 cors = CORS(app)
+# tables load lazily; set here (not only under __main__) so WSGI servers see
+# them too, e.g. HANSARD_SHARED_TABLES=/dev/shm/hansard gunicorn -w 4 app:app
+app.config.setdefault('DFS', dfs)
+app.config.setdefault('TIME_BUDGET_S', 60)           # per /api/run(_batch) request
+app.config.setdefault('MEMORY_BUDGET_BYTES', 2 << 30)
+app.config.setdefault('JOB_WORKERS', 2)              # /api/jobs worker processes
+app.config.setdefault('JOB_QUEUE', 16)               # max queued + running jobs
+app.config.setdefault('JOB_TTL_S', 600)              # finished results kept this long
+app.config.setdefault('JOB_TIME_BUDGET_S', 30 * 60)
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+# HANSARD_PROFILE_SAMPLE=0.01 logs the step timings of 1% of runs as JSON
+# lines on "dsl.profile" (off by default); unless the deployment configures
+# that logger, they go to the root handlers, or stderr
+_profile_log = logging.getLogger('dsl.profile')
+if float(os.environ.get('HANSARD_PROFILE_SAMPLE', 0)) > 0 and _profile_log.level == logging.NOTSET:
+    _profile_log.setLevel(logging.INFO)
+    if not _profile_log.handlers and not logging.getLogger().handlers:
+        _profile_log.addHandler(logging.StreamHandler())
+
+
+def _jobs() -> JobQueue:
+    global _job_queue
+    with _job_queue_lock:    # threaded servers: build exactly one queue
+        if _job_queue is None:   # workers are spawned on the first submit
+            _job_queue = JobQueue(workers=app.config['JOB_WORKERS'],
+                                  max_jobs=app.config['JOB_QUEUE'], ttl=app.config['JOB_TTL_S'],
+                                  seconds=app.config['JOB_TIME_BUDGET_S'],
+                                  max_bytes=app.config['MEMORY_BUDGET_BYTES'])
+        return _job_queue
+
+
+def _client_gone(sock):
+    """Probe: True once the peer has closed *sock* (a zero-byte peek)."""
+    def probe():
+        try:
+            return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+        except (BlockingIOError, InterruptedError):
+            return False   # still open, nothing to read
+        except OSError:
+            return True
+    return probe
+
+
+def _budget():
+    # the request body has been read by now, so EOF on the socket means the
+    # client disconnected; servers that don't expose the socket can't cancel
+    sock = request.environ.get('werkzeug.socket') or request.environ.get('gunicorn.socket')
+    return Budget(seconds=app.config['TIME_BUDGET_S'],
+                  max_bytes=app.config['MEMORY_BUDGET_BYTES'],
+                  cancel=CancelToken(_client_gone(sock)) if sock is not None else None)
+
+
+def _track_memory(profile: bool) -> bool:
+    # tracemalloc costs ~10x on allocation-heavy steps: only when profiling,
+    # or with TRACK_MEMORY=True
+    return profile or app.config.get('TRACK_MEMORY', False)
+
+
+def _log_memory(endpoint: str, metrics):
+    if 'peak_bytes' in metrics:
+        app.logger.info("BACKEND: %s peak_bytes=%d", endpoint, metrics['peak_bytes'])
+    elif 'rss_delta_bytes' in metrics:
+        app.logger.info("BACKEND: %s rss_delta_bytes=%d", endpoint, metrics['rss_delta_bytes'])
+
+
+def _aborted(e: PipelineAborted):
+    app.logger.warning("BACKEND: pipeline aborted: %s", e)
+    return jsonify(e.to_dict()), 499 if isinstance(e, Cancelled) else 422
 
 
 @app.route('/api/run', methods=['POST'])
 @cross_origin()
 def run():
-    return jsonify(run_pipeline(request.get_json(), app.config['DFS']))
+    # ?profile=1 adds per-step timings to the response under "_profile"
+    profile = request.args.get('profile', '').lower() in ('1', 'true', 'yes')
+    # ?preview=N runs on a sample and returns at most N rows per step
+    preview = request.args.get('preview', type=int)
+    metrics = {}
+    # the builder sends a per-tab X-Session-Id so unchanged steps are reused
+    try:
+        out = run_pipeline(request.get_json(), app.config['DFS'], metrics=metrics,
+                           streaming=app.config.get('STREAMING', False), profile=profile,
+                           session=request.headers.get('X-Session-Id'), preview=preview,
+                           budget=_budget(), track_memory=_track_memory(profile))
+    except ValueError as e:  # invalid step graph, unknown table
+        return jsonify({"error": str(e)}), 400
+    except PipelineAborted as e:  # over time/memory budget, or client gone
+        return _aborted(e)
+    _log_memory("/api/run", metrics)
+    if profile:
+        out["_profile"] = {**metrics["profile"], "peak_bytes": metrics["peak_bytes"]}
+    if preview is not None:
+        out["_preview"] = metrics["preview"]
+    # columnar JSON by default; Arrow IPC if the Accept header asks for it
+    body, headers = encode_results(out, request.headers.get('Accept'),
+                                   request.headers.get('Accept-Encoding'))
+    return Response(body, headers=headers)
+
+
+@app.route('/api/run_batch', methods=['POST'])
+@cross_origin()
+def run_batch_endpoint():
+    # {"pipelines": {name: dsl, ...}} (or a list) -> {name: {return id: result}}
+    metrics = {}
+    try:
+        out = run_batch(request.get_json()["pipelines"], app.config['DFS'], metrics=metrics,
+                        budget=_budget(), track_memory=_track_memory(False))
+    except ValueError as e:  # invalid step graph, unknown table
+        return jsonify({"error": str(e)}), 400
+    except PipelineAborted as e:
+        return _aborted(e)
+    _log_memory(f"/api/run_batch {metrics['batch']}", metrics)
+    body, headers = encode_results(out, None, request.headers.get('Accept-Encoding'))
+    return Response(body, headers=headers)
+
+
+@app.route('/api/jobs', methods=['POST'])
+@cross_origin()
+def submit_job():
+    # long pipelines: run in a worker process, poll status, fetch the result
+    try:
+        job_id = _jobs().submit(request.get_json())
+    except QueueFull as e:
+        return jsonify({"error": "queue_full", "message": str(e)}), 503, {"Retry-After": "30"}
+    return jsonify({"job_id": job_id}), 202
+
+
+@app.get('/api/jobs/<job_id>')
+@cross_origin()
+def job_status(job_id: str):
+    status = _jobs().status(job_id)
+    if status is None:
+        abort(404)  # unknown, or its result expired
+    return jsonify(status)
+
+
+@app.get('/api/jobs/<job_id>/result')
+@cross_origin()
+def job_result(job_id: str):
+    state, out = _jobs().result(job_id)
+    if state is None:
+        abort(404)
+    if state in ("queued", "running"):
+        return jsonify({"state": state}), 409
+    if state != "done":
+        return jsonify({"state": state, **out}), 499 if state == "cancelled" else 422
+    body, headers = encode_results(out, request.headers.get('Accept'),
+                                   request.headers.get('Accept-Encoding'))
+    return Response(body, headers=headers)
+
+
+@app.delete('/api/jobs/<job_id>')
+@cross_origin()
+def cancel_job(job_id: str):
+    if not _jobs().cancel(job_id):
+        abort(404)
+    return jsonify({"job_id": job_id, "cancelling": True})
+
+
+@app.route('/api/explain', methods=['POST'])
+@cross_origin()
+def explain():
+    try:
+        return jsonify(explain_pipeline(request.get_json(), app.config['DFS']))
+    except ValueError as e:  # invalid step graph, unknown table
+        return jsonify({"error": str(e)}), 400
+
+
+@app.get('/api/cache_stats')
+def step_cache_stats():
+    return cache_stats()
+
+
+@app.get('/api/table_stats')
+def table_stats():
+    # per table: loaded yet?, load time, rows, bytes
+    return app.config['DFS'].stats()
 
 
 @app.post("/api/division_by_id") 
@@ -64,19 +245,19 @@ def find_divisions_from_dsl_endpoint():
 @app.get("/api/schema/<table>")
 def schema(table: str):
     print(f"BACKEND: Schema requested for table: {table}")
-    if table not in dfs:
+    tables = app.config['DFS']
+    if table not in tables:
         print(f"BACKEND: Table {table} not found in dfs")
         abort(404)
-    df = dfs[table]
+    # from the stored file schema: answering this doesn't load the table
     schema_data = []
-    for c in df.columns:
-        dtype = str(df[c].dtype)
+    for c, dtype in tables.dtypes(table).items():
         # Simplify numeric types to just 'numeric'
-        if dtype in ['int64', 'float64']:
+        if dtype in ['int64', 'float64', 'Int64', 'Float64']:  # incl. nullable
             dtype = 'numeric'
         elif dtype == 'object':
             dtype = 'str'
-        elif dtype == 'bool':
+        elif dtype in ['bool', 'boolean']:
             dtype = 'bool'
         else:
             dtype = 'str'  # fallback for other types
@@ -89,10 +270,12 @@ def schema(table: str):
 @app.get("/api/preview/<table>")
 def preview(table: str):
     n = int(request.args.get("n", 5))
-    if table not in dfs:
+    tables = app.config['DFS']
+    if table not in tables:
         abort(404)
-    df = dfs[table].head(n)
-    return df.to_dict(orient="records")
+    df = tables[table].head(n)
+    # typed tables hold NaT / pd.NA, which jsonify can't serialize
+    return jsonify(to_jsonable(df.to_dict(orient="records")))
 
 
 if __name__ == '__main__':
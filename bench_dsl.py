@@ -0,0 +1,223 @@
+"""Micro‑benchmarks for the DSL engine.
+
+Run with ``python bench_dsl.py``.  Tables are synthetic so the numbers are
+reproducible without the ingest outputs.
+"""
+
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import dsl
+import result_encoding
+import table_store
+
+
+def _timeit(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _synthetic_table(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "member_id": rng.integers(1, 650, n),
+        "current_party": rng.choice(["Labour", "Conservative", "SNP"], n),
+        "n_mentions": rng.integers(0, 20, n),
+        "division_9": rng.choice([-1.0, 0.0, 1.0], n),
+    })
+
+
+def bench_mutate(n: int = 1_000_000):
+    """Vectorised `mutate` vs the original row‑wise tree walk."""
+    df = _synthetic_table(n)
+    expr = {"op": "add", "args": [
+        {"var": "n_mentions"},
+        {"op": "mul", "args": [{"var": "division_9"}, {"const": 2}]}]}
+
+    fast = _timeit(lambda: dsl.eval_expr_df(expr, df))
+    slow = _timeit(lambda: dsl._rowwise(expr)(df), repeat=1)
+    assert np.allclose(dsl.eval_expr_df(expr, df), dsl._rowwise(expr)(df))
+    print(f"mutate  rows={n:>9,}  vectorised={fast*1e3:8.1f} ms  "
+          f"row-wise={slow*1e3:8.1f} ms  speed-up={slow/fast:6.0f}x")
+
+
+def bench_copy_on_write(n: int = 200_000):
+    """Peak traced memory of a 5‑step pipeline with and without CoW."""
+    df = _synthetic_table(n)
+    df["text"] = ["lorem ipsum dolor sit amet " * 20] * n
+    steps = [
+        {"id": "s", "op": "source", "table": "t"},
+        {"id": "f", "op": "filter", "input": "s",
+         "conditions": [{"lhs": "n_mentions", "op": ">", "rhs": 0}]},
+        {"id": "m1", "op": "mutate", "input": "f", "cols": {"a": {"const": 1}}},
+        {"id": "m2", "op": "mutate", "input": "m1",
+         "cols": {"b": {"op": "add", "args": [{"var": "a"}, {"var": "n_mentions"}]}}},
+        {"id": "agg", "op": "aggregate", "input": "m2", "group": ["current_party"],
+         "metrics": {"b": {"fn": "sum", "col": "b"}}},
+    ]
+    for cow in (False, True):
+        r = dsl.Runner(steps=steps, dfs={"t": df}, max_workers=1,
+                       copy_on_write=cow, track_memory=True)
+        r.run(["agg"])
+        print(f"cow={cow!s:5}  rows={n:>9,}  peak={r.metrics['peak_bytes']/2**20:8.1f} MiB")
+
+
+def bench_groupby(n: int = 1_000_000):
+    """`aggregate` on string keys: plain strings vs categorical codes."""
+    df = _synthetic_table(n)
+    df["gender"] = np.random.default_rng(1).choice(["F", "M"], n)
+    metrics = {"n": {"fn": "count", "col": "member_id"},
+               "mentions": {"fn": "sum", "col": "n_mentions"},
+               "vote": {"fn": "mean", "col": "division_9"}}
+    by = ["current_party", "gender"]
+    named = {k: (m["col"], m["fn"]) for k, m in metrics.items()}
+    plain = _timeit(lambda: df.groupby(by, dropna=False).agg(**named).reset_index())
+    cat = dsl.categorize(df)
+    coded = _timeit(lambda: dsl._group_agg(cat, by, metrics))
+    print(f"groupby rows={n:>9,}  strings={plain*1e3:8.1f} ms  "
+          f"categorical={coded*1e3:8.1f} ms  speed-up={plain/coded:6.1f}x")
+
+
+def bench_encoding(n: int = 100_000):
+    """Response body for an n‑row result: record JSON vs columnar JSON vs
+    Arrow IPC (encode time, raw and gzip size)."""
+    df = _synthetic_table(n)
+    df.loc[::7, "division_9"] = np.nan
+    df["metric"] = np.random.default_rng(2).normal(size=n)
+    cases = {
+        "records": lambda: json.dumps(df.astype(object).where(df.notna(), None)
+                                      .to_dict(orient="records")).encode(),
+        "columnar": lambda: result_encoding.dumps({"r": df}),
+    }
+    if result_encoding.pa is not None:
+        cases["arrow"] = lambda: result_encoding.to_arrow(df, "r")
+    for name, fn in cases.items():
+        body = fn()
+        print(f"encode {name:8}  rows={n:>9,}  time={_timeit(fn)*1e3:8.1f} ms  "
+              f"size={len(body)/2**10:8.0f} KiB  gzip={len(gzip.compress(body, 5))/2**10:6.0f} KiB")
+
+
+def bench_resampling(n: int = 650, n_resamples: int = 10_000):
+    """Permutation / bootstrap tests on a Commons‑sized table."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"gender": rng.choice(["F", "M"], n), "metric": rng.normal(size=n)})
+    for test in ("permutation", "bootstrap"):
+        spec = {"test": test, "group_col": "gender", "value_col": "metric",
+                "n_resamples": n_resamples, "seed": 0}
+        fn = dsl.permutation_test if test == "permutation" else dsl.bootstrap_test
+        print(f"{test:11}  rows={n:>9,}  resamples={n_resamples:,}  "
+              f"time={_timeit(lambda: fn(df, spec))*1e3:8.1f} ms")
+
+
+# run in a fresh interpreter, so the time and RSS are those of a cold start
+_LOAD = """
+import os, resource, time
+import pandas as pd, table_store
+
+def rss():  # resident bytes now (Linux); else the peak so far
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+rss0, t0 = rss(), time.perf_counter()
+df = {how}
+t = time.perf_counter() - t0
+print(t, rss() - rss0, int(df.memory_usage(deep=True).sum()))
+"""
+
+
+def bench_table_load(n: int = 300_000):
+    """Cold load of a contributions‑shaped table: the old untyped
+    ``read_csv``, ``read_csv`` with the explicit schema, and the Parquet
+    copy (wall time, resident‑memory growth, frame size)."""
+    rng = np.random.default_rng(0)
+    parties = ["Labour", "Conservative", "Liberal Democrat", "SNP", "Green"]
+    df = pd.DataFrame({
+        "debate_id": [f"{i:08X}-27DD-4AD6-BA98-6176B0864827" for i in rng.integers(0, 5000, n)],
+        "value": rng.choice(["I beg to move that the Bill be now read a second time.",
+                             "Will the Minister give way?", "Order. Order."], n),
+        "n_char": rng.integers(10, 5000, n), "MemberId": rng.integers(1, 5000, n),
+        "is_chair": rng.random(n) < 0.05,
+        "gender": rng.choice(["F", "M"], n), "party": rng.choice(parties, n),
+        "age_proxy": rng.normal(55, 10, n).round(1),
+        "constituency": rng.choice([f"Constituency {i}" for i in range(650)], n),
+        "debate_date": pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), "D"),
+    })
+    with tempfile.TemporaryDirectory() as d:
+        df.to_csv(os.path.join(d, "contributions_2024.csv"), index=False)
+        cases = {"csv": f"pd.read_csv({os.path.join(d, 'contributions_2024.csv')!r})",
+                 "csv+schema": "table_store.read_csv_typed("
+                               f"{os.path.join(d, 'contributions_2024.csv')!r}, "
+                               "table_store.SCHEMAS['contributions_2024'])"}
+        if table_store.pyarrow is not None:
+            table_store.convert("contributions_2024", d)
+            cases["parquet"] = f"table_store.load_table('contributions_2024', {d!r})"
+        for name, how in cases.items():
+            out = subprocess.run([sys.executable, "-c", _LOAD.format(how=how)], check=True,
+                                 capture_output=True, text=True, cwd=os.path.dirname(__file__) or ".")
+            t, rss, nbytes = out.stdout.split()
+            print(f"load {name:10}  rows={n:>9,}  time={float(t)*1e3:8.1f} ms  "
+                  f"rss=+{int(rss)/2**20:6.0f} MiB  frame={int(nbytes)/2**20:6.0f} MiB")
+
+
+# per worker: private (anonymous) memory added by loading a table and
+# touching every column; mapped file pages are shared, so they don't count
+_WORKER = """
+import sys, pandas as pd, table_store
+
+def anon():
+    with open("/proc/self/smaps_rollup") as fh:
+        return next(int(l.split()[1]) for l in fh if l.startswith("Anonymous:")) * 1024
+
+pd.DataFrame({{"x": [0]}}).to_feather(sys.argv[2] + ".warm")   # load Arrow/pandas code first
+a0 = anon()
+df = {how}
+for c in df.columns:
+    df[c].isna().sum()
+print(anon() - a0)
+"""
+
+
+def bench_shared_tables(n: int = 1_000_000, workers: int = 4):
+    """Private memory per worker process for one table: each worker reading
+    its own copy vs all of them mapping one published Arrow file."""
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("shared tables: needs Linux /proc/self/smaps_rollup"); return
+    if table_store.pyarrow is None:
+        print("shared tables: needs pyarrow"); return
+    df = dsl.categorize(_synthetic_table(n))
+    df["text"] = [f"contribution {i}" for i in range(n)]
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "t.arrow")
+        table_store.publish(df, path)
+        for name, how in [("private", f"pd.read_feather({path!r})"),
+                          ("mapped", f"table_store.map_frame({path!r})")]:
+            procs = [subprocess.Popen([sys.executable, "-c", _WORKER.format(how=how), "", path],
+                                      stdout=subprocess.PIPE, text=True,
+                                      cwd=os.path.dirname(__file__) or ".") for _ in range(workers)]
+            priv = [int(p.communicate()[0]) for p in procs]
+            print(f"tables {name:8}  rows={n:>9,}  workers={workers}  "
+                  f"private/worker={np.mean(priv)/2**20:6.1f} MiB  "
+                  f"total={sum(priv)/2**20:6.1f} MiB  (file {os.path.getsize(path)/2**20:.0f} MiB)")
+
+
+if __name__ == "__main__":
+    bench_mutate()
+    bench_copy_on_write()
+    bench_groupby()
+    bench_encoding()
+    bench_resampling()
+    bench_table_load()
+    bench_shared_tables()
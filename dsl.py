@@ -70,7 +70,21 @@ tests**.  The old single‑blob JSON was hitting a wall.
 ```
 
 * Every **step** produces a named DataFrame or value that later steps can use.
-* The runtime executes steps top‑to‑bottom, memoising each output.
+* The runtime executes only the steps `return` depends on, in dependency
+  order, memoising each output (list order doesn't matter; dead steps such
+  as an abandoned `division_votes` are never run).  Independent branches
+  run concurrently on a thread pool (`max_workers`, default 4; 1 = serial).
+* Copy‑on‑write mode (default) replaces defensive `.copy()`s with pandas CoW:
+  intermediates share column buffers, only written columns are materialised
+  and the shared `dfs` tables are never mutated.
+* Before running, `optimize_plan` fuses consecutive filters, pushes filters
+  into their `source` (`where`) and projects sources down to the columns
+  later steps read; `Runner.plan.rewrites` lists what it did.
+* Streaming mode (`streaming=True`) runs source → filter/mutate chains chunk
+  by chunk (`chunk_size` rows) and aggregates sum/count/min/max/mean from
+  per‑chunk partials, so peak memory is bounded by the chunk and the group
+  count rather than the table.  `ChunkedTable` lets a CSV set too big to load
+  sit in `dfs`; other ops materialise their input first.
 * `return` lists which artefacts to send back to the client (could be one or
   many for dashboards with several plots).
 
@@ -85,8 +99,24 @@ tests**.  The old single‑blob JSON was hitting a wall.
 | `mutate`        | Add/replace columns from expression trees                          |
 | `aggregate`     | Group‑by + summarise (supports multiple metrics at once)           |
 | `join`          | Merge an *array* of inputs on key cols (`how`: inner/left/outer)    |
+| `asof_join`     | `[left, right]`: nearest earlier/later `right_on` per `on` key      |
+| `interval_join` | `[left, intervals]`: rows whose `left_on` lies in [`start`, `end`]   |
 | `division_votes`| Pull votes for 1‑n divisions -> wide DF (`division_123` columns)   |
-| `stat_test`     | `t` (2‑sample), `pearson`, `ols` (via statsmodels)                 |
+| `stat_test`     | `t` (2‑sample), `pearson`, `ols` (via statsmodels),                |
+|                 | `permutation`, `bootstrap` (seedable, see below)                   |
+
+`permutation` takes `group_col` + `value_col` (difference in means) or `x` +
+`y` (Pearson r) and returns a p‑value; `bootstrap` takes `value_col` (plus an
+optional `group_col`) or `x` + `y` and returns a percentile CI.  Both accept
+`n_resamples` (default 10 000) and `seed`; `permutation` also accepts
+`alternative`, and `bootstrap` accepts `statistic` (mean/median) and
+`confidence`.
+
+`interval_join` attaches time‑varying attributes (party, committee, post)
+as of each row's date, e.g. `{"op": "interval_join", "inputs": ["contrib",
+"parties"], "on": ["member_id"], "left_on": "date", "start": "start", "end":
+"end"}`; options `how` (left/inner) and `closed`.  `asof_join` takes
+`left_on`/`right_on` and `direction` (backward/forward/nearest).
 
 Everything is still *safe*: expressions use the same small arithmetic/boolean
 language as before; the only external call is the votes API fetcher.
@@ -115,6 +145,44 @@ above you’d get:
 ──────────────────────────────────────────────────────────────────────────────
 * Steps are executed lazily and cached in a dict `env[id]` so you can reference
   the same intermediate many times without recomputation.
+* Across requests, step outputs are also kept in `STEP_CACHE`, keyed by a hash
+  of the step spec + its inputs' hashes + the base‑table version, so an
+  unchanged `source`→`filter`→… prefix is not recomputed when the frontend
+  resubmits the pipeline.  `cache_stats()` reports hits/misses.
+* A `HANSARD_PROFILE_SAMPLE` share of runs (default 0: opt‑in) times each
+  executed step (wall and CPU time, rows in/out, cache hit/miss, plus
+  per‑division HTTP timings for `division_votes`) and logs it as a JSON
+  line on the ``dsl.profile`` logger (only while that logger is enabled for
+  INFO) for aggregation across requests.  `profile=True` always times the
+  run, adds output bytes and returns the steps in ``metrics["profile"]``.
+* `explain_pipeline` returns the optimised plan without running it, with
+  row estimates from per‑column statistics (distinct counts, min/max;
+  computed once per table version), cache status and the division ids that
+  would be fetched over the network.
+* `categorize` stores low‑cardinality string columns of the base tables as
+  categoricals; `aggregate` groups on their codes (sum/count/mean by
+  `np.bincount` over packed codes), computes all metrics that share an fn in
+  one pass and returns keys with their original dtype.
+* Builder sessions (`run_pipeline(..., session=id)`) keep the previous run's
+  outputs with each step's key; on the next run unchanged steps are reused
+  and only edited steps and their descendants recompute.  `SESSIONS` drops
+  sessions idle for 30 min and evicts LRU ones above 256 MiB in total
+  (counting only memory a session owns, not base‑table columns it shares).
+* Preview mode (`run_pipeline(..., preview=n)`) streams each source from at
+  most 50k sampled rows (random 2k‑row chunks) and stops returned steps after n
+  rows, so a filter stops scanning once it has n matches.  Aggregates over
+  a sampled source, and joins of two sampled sources, are listed as
+  approximate in ``metrics["preview"]``.
+* `run_batch` runs several pipelines as one graph (`merge_pipelines` keeps
+  one copy of each structurally identical subtree), so dashboards pay for a
+  shared source/filter prefix once.
+* A `Budget` (wall seconds, bytes held by the run's step outputs, a
+  `CancelToken`) is checked before/after every step, per streamed chunk,
+  per 100k‑row slice of a filter mask, per resampling batch and between
+  join merges; an over‑budget run raises `BudgetExceeded` with the step
+  that was executing, and parallel branches stop at their next check.
+  Held bytes leave out cache/session hits and columns shared with the
+  base tables, and text columns are sized from a sample of rows.
 * The core execution loop is ~150 lines; each `op` has its own helper.
 * New ops are trivial: write a function that takes `**params` & `env` and
   returns a DataFrame or dict.
@@ -125,24 +193,47 @@ Code (trimmed docstring ends here) – scroll down for full implementation.
 
 from __future__ import annotations
 
-import re, time, operator as _op
-from dataclasses import dataclass
-from functools import lru_cache
-from typing import Any, Dict, Iterable, Literal, List
+import hashlib, heapq, json, logging, os, random, re, tempfile, threading, time, tracemalloc, uuid, weakref, operator as _op
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache, reduce
+from typing import Any, Callable, Dict, Iterable, Iterator, Literal, List, Optional
 
 import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import statsmodels.api as sm
 from scipy import stats
-from dsl_supporter import dfs
+
+import text_search
+from text_search import compile_pattern
 
 # ---------------------------------------------------------------------------
 # 0️⃣  CONFIG
 # ---------------------------------------------------------------------------
-_COMMONS_API = "https://commonsvotes-api.parliament.uk/data/division/{id}.json"
-_LORDS_API   = "https://lordsvotes-api.parliament.uk/data/Divisions/{id}"
+_COMMONS_API = os.environ.get("HANSARD_COMMONS_VOTES_API",
+                              "https://commonsvotes-api.parliament.uk/data/division/{id}.json")
+_LORDS_API   = os.environ.get("HANSARD_LORDS_VOTES_API",
+                              "https://lordsvotes-api.parliament.uk/data/Divisions/{id}")
 _API_RETRIES = 3; _TIMEOUT = 6
+_FETCH_WORKERS = 64          # concurrent vote downloads
+_VOTE_CACHE_DIR = os.environ.get("HANSARD_VOTE_CACHE", "./output/vote_cache")
+_CACHE_BYTES = 512 * 2**20   # step‑result cache budget (shared by requests)
+_MAX_WORKERS = 4             # threads for independent pipeline branches
+_CHUNK_ROWS = 100_000        # rows per chunk in streaming mode
+_PREVIEW_CHUNK = 2_000        # preview mode: rows per sampled chunk …
+_PREVIEW_SCAN = 50_000        # … and max rows read from each source
+_CATEGORY_MAX_RATIO = 0.5   # string columns at most this unique become categoricals
+_RESAMPLES = 10_000          # default n_resamples for permutation/bootstrap
+_RESAMPLE_CELLS = 4_000_000  # max index‑matrix cells per batch (bounds memory)
+_SESSION_TTL = 30 * 60        # seconds an idle builder session is kept
+_SESSION_BYTES = 256 << 20    # step outputs held across all sessions
+_SIZE_SAMPLE = 1_000          # rows sampled to size a Python‑string column
+_PROFILE_LOG = logging.getLogger("dsl.profile")   # one JSON line per timed step
+_PROFILE_SAMPLE = float(os.environ.get("HANSARD_PROFILE_SAMPLE", "0"))  # share of runs logged
 
 # ---------------------------------------------------------------------------
 # 1️⃣  SAFE EXPR  (data‑column arithmetic)
@@ -165,31 +256,192 @@ def _eval(node, row):
         return _eval(node["expr"], row)
     raise ValueError("bad expr")
 
+def _rowwise(node):
+    """Fallback: the original per‑row tree walk, wrapped as a compiled fn."""
+    return lambda df: df.apply(lambda r: _eval(node, r), axis=1)
+
+
+def _fold_min(*a):
+    # same tie/NaN behaviour as builtin ``min``: keep current unless next < it
+    out = a[0]
+    for x in a[1:]:
+        out = np.where(x < out, x, out)
+    return out
+
+def _fold_max(*a):
+    out = a[0]
+    for x in a[1:]:
+        out = np.where(x > out, x, out)
+    return out
+
+def _logical(ufunc):
+    def fn(*a):
+        if len(a) == 1:
+            return np.asarray(a[0]).astype(bool)
+        return reduce(ufunc, a)
+    return fn
+
+# whole‑column equivalents of `_ALLOWED`; ops missing here fall back to rows
+_VECTOR = {
+    "add": _op.add, "sub": _op.sub, "mul": _op.mul, "div": _op.truediv,
+    "pow": _op.pow, "neg": _op.neg, "abs": abs,
+    "min": _fold_min, "max": _fold_max,
+    "and": _logical(np.logical_and), "or": _logical(np.logical_or),
+}
+
+
+def _compile(node):
+    """Compile an expression tree once into ``fn(df) -> Series | scalar``
+    built from whole‑column NumPy/pandas operations."""
+    if "var" in node:
+        col = node["var"]
+        return lambda df: df[col]
+    if "const" in node:
+        val = node["const"]
+        return lambda df: val
+    if "op" in node:
+        name = node["op"]
+        if name not in _ALLOWED:
+            raise ValueError(f"unknown expr op '{name}'")
+        if name not in _VECTOR:
+            return _rowwise(node)
+        fn = _VECTOR[name]
+        args = [_compile(n) for n in node["args"]]
+        return lambda df: fn(*[a(df) for a in args])
+    if "expr" in node:
+        return _compile(node["expr"])
+    raise ValueError("bad expr")
+
+
+@lru_cache(maxsize=512)
+def _compile_cached(key: str):
+    return _compile(json.loads(key))
+
+
 def eval_expr_df(expr, df):
-    return df.apply(lambda r: _eval(expr, r), axis=1)
+    fn = _compile_cached(json.dumps(expr, sort_keys=True))
+    try:
+        out = fn(df)
+    except TypeError:  # e.g. mixed object columns – keep the row semantics
+        return _rowwise(expr)(df)
+    if isinstance(out, pd.Series):
+        return out
+    if np.ndim(out) == 0:
+        return pd.Series([out] * len(df), index=df.index)
+    return pd.Series(out, index=df.index)
 
 # ---------------------------------------------------------------------------
 # 2️⃣  DIVISION VOTES FETCHER
 # ---------------------------------------------------------------------------
-@lru_cache(maxsize=256)
-def _fetch_votes(div_id: int, house: int) -> pd.DataFrame:
-    api = _COMMONS_API if house == 1 else _LORDS_API
-    for a in range(_API_RETRIES):
-        try:
-            js = requests.get(api.format(id=div_id), timeout=_TIMEOUT).json()
-            blocks = {"Ayes": "AYE", "Noes": "NO", "NoVoteRecorded": "NOTREC"}
-            if house == 2:  # Lords payload nested
-                js = js.get("Division", js)
-            frames = []
-            for k, lbl in blocks.items():
-                block = js.get(k) or []
-                if not block: continue
-                df = pd.json_normalize(block)[["MemberId"]].rename(columns={"MemberId":"member_id"})
-                df["vote"] = lbl; frames.append(df)
-            return pd.concat(frames, ignore_index=True)
-        except Exception:
-            if a == _API_RETRIES-1: raise
-            time.sleep(1+a)
+class VoteFetcher:
+    """Concurrent division‑vote fetcher with a persistent on‑disk cache.
+
+    Each (house, division) is downloaded once over a pooled session, written
+    to `cache_dir` as JSON (atomic rename, so worker processes can share the
+    directory) and kept in memory as read‑only arrays.  `fetch` builds a new
+    DataFrame over those arrays on every call, so callers can't alter the
+    cache.  Point `commons_api`/`lords_api` at a local stub to test."""
+
+    _BLOCKS = {"Ayes": "AYE", "Noes": "NO", "NoVoteRecorded": "NOTREC"}
+
+    def __init__(self, commons_api: str = _COMMONS_API, lords_api: str = _LORDS_API,
+                 cache_dir: Optional[str] = _VOTE_CACHE_DIR,
+                 max_workers: int = _FETCH_WORKERS,
+                 retries: int = _API_RETRIES, timeout: float = _TIMEOUT):
+        self.apis = {1: commons_api, 2: lords_api}
+        self.cache_dir, self.max_workers = cache_dir, max_workers
+        self.retries, self.timeout = retries, timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter); self.session.mount("https://", adapter)
+        self._mem: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, div_id: int, house: int) -> str:
+        return os.path.join(self.cache_dir, f"{house}_{div_id}.json")
+
+    @staticmethod
+    def _frozen(ids, votes) -> tuple:
+        arrs = (np.asarray(ids, dtype=np.int64), np.asarray(votes, dtype=object))
+        for a in arrs:
+            a.flags.writeable = False
+        return arrs
+
+    def _lookup(self, key: tuple) -> Optional[tuple]:
+        hit = self._mem.get(key)
+        if hit is None and self.cache_dir:
+            try:
+                with open(self._path(key[1], key[0])) as fh:
+                    js = json.load(fh)
+            except (OSError, ValueError):
+                return None
+            hit = self._mem[key] = self._frozen(js["member_id"], js["vote"])
+        return hit
+
+    def _download(self, div_id: int, house: int) -> tuple:
+        for a in range(self.retries):
+            try:
+                r = self.session.get(self.apis[house].format(id=div_id), timeout=self.timeout)
+                r.raise_for_status()
+                js = r.json()
+                if house == 2:  # Lords payload nested
+                    js = js.get("Division", js)
+                ids, votes = [], []
+                for k, lbl in self._BLOCKS.items():
+                    block = js.get(k) or []
+                    ids += [m["MemberId"] for m in block]; votes += [lbl] * len(block)
+                break
+            except Exception:
+                if a == self.retries - 1: raise
+                time.sleep(1 + a)
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as fh:
+                json.dump({"member_id": ids, "vote": votes}, fh)
+            os.replace(tmp, self._path(div_id, house))
+        return self._frozen(ids, votes)
+
+    def is_cached(self, div_id: int, house: int) -> bool:
+        return (house, div_id) in self._mem or bool(
+            self.cache_dir and os.path.exists(self._path(div_id, house)))
+
+    def fetch_many(self, div_ids: Iterable[int], house: int,
+                   timings: Optional[List[Dict[str, Any]]] = None) -> Dict[int, pd.DataFrame]:
+        """Votes for every id in *div_ids*; misses are downloaded concurrently.
+        If *timings* is a list, one entry per download is appended to it."""
+        div_ids = list(dict.fromkeys(div_ids))
+        got = {d: self._lookup((house, d)) for d in div_ids}
+        todo = [d for d, v in got.items() if v is None]
+
+        def download(d):
+            t0 = time.perf_counter()
+            arrs = self._download(d, house)
+            if timings is not None:
+                timings.append({"division_id": d, "house": house,
+                                "seconds": round(time.perf_counter() - t0, 6)})
+            return arrs
+
+        if todo:
+            with ThreadPoolExecutor(min(len(todo), self.max_workers),
+                                    thread_name_prefix="votes") as pool:
+                for d, arrs in zip(todo, pool.map(download, todo)):
+                    with self._lock:
+                        got[d] = self._mem.setdefault((house, d), arrs)
+        return {d: pd.DataFrame({"member_id": v[0], "vote": v[1]}) for d, v in got.items()}
+
+    def fetch(self, div_id: int, house: int) -> pd.DataFrame:
+        return self.fetch_many([div_id], house)[div_id]
+
+    def clear(self, disk: bool = False) -> None:
+        self._mem.clear()
+        if disk and self.cache_dir and os.path.isdir(self.cache_dir):
+            for f in os.listdir(self.cache_dir):
+                if f.endswith(".json"):
+                    os.remove(os.path.join(self.cache_dir, f))
+
+
+VOTES = VoteFetcher()
 
 # ---------------------------------------------------------------------------
 # 2️⃣ᵇ  BOOLEAN CONDITION TREES (for complex filters)
@@ -203,21 +455,1250 @@ _OP_BOOL = {
 _COMP = {
     "=": _op.eq, "==": _op.eq, "!=": _op.ne, "<": _op.lt, "<=": _op.le,
     ">": _op.gt, ">=": _op.ge,
-    "icontains": lambda s, x: s.str.contains(x, case=False, na=False),
-    "noticontains": lambda s, x: ~s.str.contains(x, case=False, na=False),
-    "regex": lambda s, x: s.str.contains(x, regex=True, na=False),
+    "icontains": lambda s, x: s.str.contains(compile_pattern(x, True), na=False),
+    "noticontains": lambda s, x: ~s.str.contains(compile_pattern(x, True), na=False),
+    "regex": lambda s, x: s.str.contains(compile_pattern(x), na=False),
 }
+_STR_OPS = {"icontains": True, "noticontains": True, "regex": False}  # → ignore case
 
-def _cond_series(node: Dict[str, Any], df: pd.DataFrame) -> pd.Series:
+def _cond_series(node: Dict[str, Any], df: pd.DataFrame, memo=None) -> pd.Series:
     """Recursively evaluate a boolean expression tree on DataFrame `df` and
-    return a boolean Series the same length as df."""
+    return a boolean Series the same length as df.  *memo* holds masks of
+    string leaves already computed by `_string_masks`."""
     if "op" in node and node["op"] in _OP_BOOL:  # logical node
         op = node["op"]
-        args = [_cond_series(n, df) for n in node.get("args", [])]
+        args = [_cond_series(n, df, memo) for n in node.get("args", [])]
         return _OP_BOOL[op](*args)
+    if memo and id(node) in memo:
+        return pd.Series(memo[id(node)], index=df.index)
     # otherwise assume a comparison leaf
     lhs = node["lhs"]; cmp = node["op"]; rhs = node["rhs"]
-    return _COMP[cmp](df[lhs], rhs)
+    x = df[lhs]
+    if isinstance(x.dtype, pd.CategoricalDtype) and cmp in ("<", "<=", ">", ">="):
+        # unordered categoricals can't be ranked: compare the categories, map by code
+        hit = np.append(_COMP[cmp](pd.Series(x.cat.categories), rhs).to_numpy(bool), False)
+        return pd.Series(hit[x.cat.codes.to_numpy()], index=df.index)
+    # nullable (Int64/boolean/string) columns compare to NA on missing rows:
+    # those rows fail the test, except for "!=" (as NaN does in float columns)
+    hit = _COMP[cmp](x, rhs)
+    return pd.Series(hit.to_numpy(bool, na_value=cmp == "!="), index=df.index)
+
+def _string_masks(cond_tree, df: pd.DataFrame) -> Dict[int, np.ndarray]:
+    """Masks for every string leaf in *cond_tree*, keyed by id(leaf).  All
+    patterns on one column are matched together in a single scan."""
+    by_col: Dict[str, List[Dict[str, Any]]] = {}
+    def walk(node):
+        if node.get("op") in _OP_BOOL:
+            for n in node.get("args", []):
+                walk(n)
+        elif node.get("op") in _STR_OPS:
+            by_col.setdefault(node["lhs"], []).append(node)
+    for n in _conds(cond_tree):
+        walk(n)
+    memo = {}
+    for col, leaves in by_col.items():
+        if col not in df:
+            continue
+        ix = text_search.index_for(df, col)  # only set on indexed base tables
+        if ix is None and not text_search.supports(df[col]):
+            continue
+        masks = text_search.match_many(df[col], [(n["rhs"], _STR_OPS[n["op"]]) for n in leaves], ix)
+        for n, m in zip(leaves, masks):
+            memo[id(n)] = ~m if n["op"] == "noticontains" else m
+    return memo
+
+def _filter_mask(cond_tree, df: pd.DataFrame, check: Optional[Callable[[], None]] = None):
+    """Row mask of *cond_tree* over *df*.  With *check*, a large frame
+    without a text index is masked `_CHUNK_ROWS` rows at a time with
+    *check()* before each slice, so a budget can stop a slow regex scan."""
+    if check is not None and len(df) > _CHUNK_ROWS and not any(
+            text_search.index_for(df, c) is not None for c in _cond_cols(cond_tree)):
+        parts = []
+        for lo in range(0, len(df), _CHUNK_ROWS):
+            check()
+            parts.append(np.asarray(_filter_mask(cond_tree, df.iloc[lo:lo + _CHUNK_ROWS]), bool))
+        return np.concatenate(parts)
+    memo = _string_masks(cond_tree, df)
+    # Back‑compat: if a list → implicit AND of list elements
+    if isinstance(cond_tree, list):
+        return np.logical_and.reduce([_cond_series(c, df, memo) for c in cond_tree])
+    return _cond_series(cond_tree, df, memo)  # dict expression tree
+
+# ---------------------------------------------------------------------------
+# 2️⃣ᶜ  STEP RESULT CACHE (content‑addressed, shared across requests)
+# ---------------------------------------------------------------------------
+_TABLE_VERSIONS: Dict[int, tuple] = {}   # id(df) -> (weakref, token)
+_TABLE_BUFFERS: Dict[int, tuple] = {}    # id(df) -> (weakref, column buffer addresses)
+
+
+def table_version(df: pd.DataFrame) -> str:
+    """Opaque token identifying *this* base‑table object.  A reloaded table is
+    a new object and gets a new token; call `bump_table_version` after
+    mutating a table in place."""
+    k = id(df)
+    ent = _TABLE_VERSIONS.get(k)
+    if ent is not None and ent[0]() is df:
+        return ent[1]
+
+    def _drop(ref, k=k):
+        if _TABLE_VERSIONS.get(k, (None,))[0] is ref:
+            del _TABLE_VERSIONS[k]
+
+    token = uuid.uuid4().hex
+    _TABLE_VERSIONS[k] = (weakref.ref(df, _drop), token)
+    return token
+
+
+def bump_table_version(df: pd.DataFrame) -> None:
+    _TABLE_VERSIONS.pop(id(df), None)
+    _TABLE_BUFFERS.pop(id(df), None)
+
+
+def _col_nbytes(x) -> int:
+    """Bytes of one column (Series) or index.  Python‑object columns are
+    sized from `_SIZE_SAMPLE` evenly spaced rows: a deep count visits every
+    string and takes ~0.2 s on a million‑row text column."""
+    if x.dtype == object and len(x) > 2 * _SIZE_SAMPLE:
+        step = len(x) // _SIZE_SAMPLE
+        part = x[::step] if isinstance(x, pd.Index) else x.iloc[::step]
+        deep = part.memory_usage(deep=True) if isinstance(x, pd.Index) else \
+            part.memory_usage(deep=True, index=False)
+        return int(deep * len(x) / len(part))
+    return int(x.memory_usage(deep=True) if isinstance(x, pd.Index) else
+               x.memory_usage(deep=True, index=False))
+
+
+def _nbytes(obj) -> int:
+    if isinstance(obj, pd.DataFrame):
+        return _col_nbytes(obj.index) + sum(_col_nbytes(obj.iloc[:, i])
+                                            for i in range(obj.shape[1]))
+    if isinstance(obj, pd.Series):
+        return _col_nbytes(obj.index) + _col_nbytes(obj)
+    return len(json.dumps(obj, default=str))
+
+
+def _buffer(col: pd.Series) -> Optional[int]:
+    """Address of the buffer holding *col*'s values (NumPy, categorical codes
+    or Arrow data), or None for other arrays.  Shallow copies and column
+    projections of a frame share it under copy‑on‑write."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        col = col.cat.codes
+    if getattr(col.dtype, "storage", None) == "pyarrow":
+        chunks = col.array.__arrow_array__().chunks
+        return next((b.address for b in reversed(chunks[0].buffers()) if b is not None),
+                    None) if chunks else None
+    if isinstance(col.dtype, np.dtype):
+        return col.to_numpy(copy=False).__array_interface__["data"][0]
+    return None
+
+
+def _base_buffers(dfs) -> set:
+    """`_buffer`s of every column of the base tables already in memory
+    (computed once per table object)."""
+    loaded = getattr(dfs, "is_loaded", None)
+    out = set()
+    for name in dfs:
+        if loaded is not None and not loaded(name):
+            continue
+        df = dfs[name]
+        if not isinstance(df, pd.DataFrame):
+            continue
+        k = id(df)
+        ent = _TABLE_BUFFERS.get(k)
+        if ent is None or ent[0]() is not df:
+            def _drop(ref, k=k):
+                if _TABLE_BUFFERS.get(k, (None,))[0] is ref:
+                    del _TABLE_BUFFERS[k]
+            bufs = {_buffer(df.iloc[:, i]) for i in range(df.shape[1])} - {None}
+            ent = _TABLE_BUFFERS[k] = (weakref.ref(df, _drop), bufs)
+        out |= ent[1]
+    return out
+
+
+def _owned_nbytes(obj, shared: set) -> int:
+    """`_nbytes` of *obj* leaving out columns whose values live in *shared*
+    buffers (see `_base_buffers`): a `source` step's shallow copy of a base
+    table owns next to nothing."""
+    if not isinstance(obj, pd.DataFrame) or not shared:
+        return _nbytes(obj)
+    return _col_nbytes(obj.index) + sum(
+        _col_nbytes(obj.iloc[:, i]) for i in range(obj.shape[1])
+        if _buffer(obj.iloc[:, i]) not in shared)
+
+
+def _rows(obj) -> Optional[int]:
+    return len(obj) if isinstance(obj, (pd.DataFrame, pd.Series)) else None
+
+
+def _digest(payload) -> str:
+    blob = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+class StepCache:
+    """LRU of step outputs keyed by content hash, bounded by `max_bytes`.
+
+    Values are shared between requests, so ops must never mutate their
+    inputs in place (they don't – every op builds a new frame)."""
+
+    def __init__(self, max_bytes: int = _CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def get(self, key: str):
+        """Return ``(True, value)`` on a hit, ``(False, None)`` otherwise."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, self._data[key][0]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, value, size: Optional[int] = None) -> None:
+        """Store *value*, charged *size* bytes (default `_nbytes`; callers
+        pass `_owned_nbytes` so columns shared with a base table are free)."""
+        size = _nbytes(value) if size is None else size
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, sz) = self._data.popitem(last=False)
+                self._bytes -= sz; self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear(); self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._data), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+
+STEP_CACHE = StepCache()
+
+# ---------------------------------------------------------------------------
+# 2️⃣ᵈ  PLANNER  (dependency DAG, dead‑step elimination)
+# ---------------------------------------------------------------------------
+def _deps(step: Dict[str, Any]) -> List[str]:
+    if "input" in step:
+        return [step["input"]]
+    return list(step.get("inputs", []))
+
+
+@dataclass
+class Plan:
+    order: List[str]                 # live step ids, topologically sorted
+    steps: Dict[str, Dict[str, Any]]
+    deps: Dict[str, List[str]]
+    pruned: List[str]                # steps nothing in `return` depends on
+    returns: List[str] = field(default_factory=list)
+    rewrites: List[Dict[str, Any]] = field(default_factory=list)
+    columns: Dict[str, Optional[List[str]]] = field(default_factory=dict)
+
+    def users(self) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {sid: [] for sid in self.order}
+        for sid in self.order:
+            for d in dict.fromkeys(self.deps[sid]):
+                out[d].append(sid)
+        return out
+
+    def _drop(self, sid: str):
+        self.order.remove(sid); del self.steps[sid]; del self.deps[sid]
+
+
+def build_plan(steps: List[Dict[str, Any]], return_ids: List[str]) -> Plan:
+    """Validate the step graph and order the steps `return_ids` depend on.
+
+    Raises ValueError on duplicate ids, references to unknown steps and
+    cycles.  Ties in the topological order keep the original list order."""
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for s in steps:
+        if s["id"] in by_id:
+            raise ValueError(f"duplicate step id '{s['id']}'")
+        by_id[s["id"]] = s
+    deps = {sid: _deps(s) for sid, s in by_id.items()}
+    for sid, ds in deps.items():
+        for d in ds:
+            if d not in by_id:
+                raise ValueError(f"step '{sid}' references unknown step '{d}'")
+    for r in return_ids:
+        if r not in by_id:
+            raise ValueError(f"return references unknown step '{r}'")
+
+    # reachability from the returned ids (+ cycle detection)
+    live, state = set(), {}
+    for root in return_ids:
+        if root in state:
+            continue
+        state[root] = "open"
+        stack = [(root, iter(deps[root]))]
+        while stack:
+            sid, it = stack[-1]
+            nxt = next(it, None)
+            if nxt is None:
+                state[sid] = "done"; live.add(sid); stack.pop()
+            elif state.get(nxt) == "open":
+                cyc = [x for x, _ in stack] + [nxt]
+                raise ValueError("cycle in pipeline: " + " -> ".join(cyc[cyc.index(nxt):]))
+            elif nxt not in state:
+                state[nxt] = "open"; stack.append((nxt, iter(deps[nxt])))
+
+    pos = {s["id"]: i for i, s in enumerate(steps)}
+    indeg = {sid: len(set(deps[sid])) for sid in live}
+    users: Dict[str, List[str]] = {sid: [] for sid in live}
+    for sid in live:
+        for d in set(deps[sid]):
+            users[d].append(sid)
+    ready = [(pos[sid], sid) for sid in live if indeg[sid] == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, sid = heapq.heappop(ready)
+        order.append(sid)
+        for u in users[sid]:
+            indeg[u] -= 1
+            if indeg[u] == 0:
+                heapq.heappush(ready, (pos[u], u))
+    return Plan(order=order, steps={sid: by_id[sid] for sid in order},
+                deps={sid: deps[sid] for sid in order},
+                pruned=[s["id"] for s in steps if s["id"] not in live],
+                returns=list(return_ids))
+
+
+def _conds(tree) -> List[Dict[str, Any]]:
+    return list(tree) if isinstance(tree, list) else [tree]
+
+
+def _cond_cols(tree) -> set:
+    out = set()
+    for node in _conds(tree):
+        if node.get("op") in _OP_BOOL:
+            args = node.get("args", [])
+            out |= _cond_cols(args if isinstance(args, list) else [args])
+        else:
+            out.add(node["lhs"])
+    return out
+
+
+def _expr_vars(node) -> set:
+    if "var" in node:  return {node["var"]}
+    if "expr" in node: return _expr_vars(node["expr"])
+    if "lhs" in node:  return {node["lhs"]}
+    return set().union(*[_expr_vars(n) for n in node.get("args", [])])
+
+
+def _input_cols(s: Dict[str, Any], need: Optional[set]) -> Optional[set]:
+    """Columns step *s* reads from its input(s) given the columns its own
+    consumers need (None = everything)."""
+    op = s["op"]
+    if op == "aggregate":
+        return set(s["group"]) | {m["col"] for m in s["metrics"].values()}
+    if op == "stat_test":
+        cols = {"t": ("group_col", "value_col"), "pearson": ("x", "y")}.get(s["test"])
+        if cols:
+            return {s[c] for c in cols}
+        if s["test"] == "ols":
+            return {s["y"], *s["X"]}
+        if s["test"] in ("permutation", "bootstrap"):
+            return {s[c] for c in ("group_col", "value_col", "x", "y") if c in s}
+        return None
+    if need is None:
+        return None
+    if op == "filter":
+        return need | _cond_cols(s["conditions"])
+    if op == "mutate":
+        return (need - set(s["cols"])).union(*[_expr_vars(e) for e in s["cols"].values()])
+    if op == "join":  # keep both sides of any merge‑suffixed name
+        base = {c[:-2] for c in need if c.endswith(("_x", "_y"))}
+        return need | base | set(s["on"])
+    return None
+
+
+def optimize_plan(p: Plan, table_columns) -> Plan:
+    """Rewrite *p* in place and log each rewrite in ``p.rewrites``:
+
+    * ``fuse_filters`` – a filter whose input is a single‑use filter absorbs it
+      (one mask instead of two).
+    * ``push_filter`` – a filter over a single‑use `source` becomes that source
+      with a ``where`` clause, so the scan is masked before anything is copied.
+    * ``project``     – sources keep only the columns some later step reads
+      (``p.columns`` holds the needed set for every step).
+
+    *table_columns(table)* returns a base table's column names."""
+    keep = set(p.returns)
+    for sid in list(p.order):
+        s = p.steps[sid]
+        if s["op"] != "filter":
+            continue
+        src = p.steps[s["input"]]
+        if src["op"] == "filter" and p.users()[src["id"]] == [sid] and src["id"] not in keep:
+            p.steps[sid] = {**s, "input": src["input"],
+                            "conditions": _conds(src["conditions"]) + _conds(s["conditions"])}
+            p.deps[sid] = [src["input"]]
+            p._drop(src["id"])
+            p.rewrites.append({"rule": "fuse_filters", "step": sid, "fused": src["id"]})
+
+    for sid in list(p.order):
+        s = p.steps[sid]
+        if s["op"] != "filter":
+            continue
+        src = p.steps[s["input"]]
+        if src["op"] == "source" and "where" not in src \
+                and p.users()[src["id"]] == [sid] and src["id"] not in keep:
+            p.steps[sid] = {**{k: v for k, v in src.items() if k != "id"}, "id": sid,
+                            "where": _conds(s["conditions"])}
+            p.deps[sid] = []
+            p._drop(src["id"])
+            p.rewrites.append({"rule": "push_filter", "step": sid, "source": src["id"]})
+
+    users = p.users()
+    need: Dict[str, Optional[set]] = {}
+    for sid in reversed(p.order):
+        if sid in keep:
+            need[sid] = None
+            continue
+        cols: Optional[set] = set()
+        for u in users[sid]:
+            c = _input_cols(p.steps[u], need[u])
+            cols = None if c is None or cols is None else cols | c
+        need[sid] = cols
+    p.columns = {sid: (sorted(c) if c is not None else None) for sid, c in need.items()}
+
+    for sid in p.order:
+        s = p.steps[sid]
+        if s["op"] != "source" or need[sid] is None:
+            continue
+        avail = list(table_columns(s["table"]))
+        cols = [c for c in avail if c in need[sid]]
+        if len(cols) < len(avail):
+            p.steps[sid] = {**s, "columns": cols}
+            p.rewrites.append({"rule": "project", "step": sid, "columns": cols})
+    return p
+
+
+def merge_pipelines(dsls: Dict[str, Dict[str, Any]]):
+    """Merge several DSL documents into one step list, keeping one copy of
+    every structurally identical subtree (same spec, same input subtrees).
+
+    Returns ``(steps, returns, shared)``: the merged steps (ids
+    ``"<pipeline>:<step id>"`` of the first occurrence), ``{pipeline:
+    {return id: merged id}}`` and the number of steps that were shared
+    instead of repeated.  Each document is validated like `build_plan`."""
+    merged: List[Dict[str, Any]] = []
+    by_key: Dict[str, str] = {}          # structural key -> merged id
+    returns: Dict[str, Dict[str, str]] = {}
+    shared = 0
+    for name, dsl in dsls.items():
+        ret = dsl.get("return", [dsl["steps"][-1]["id"]])
+        plan = build_plan(dsl["steps"], ret)
+        ids: Dict[str, str] = {}         # this pipeline's id -> merged id
+        keys: Dict[str, str] = {}
+        for sid in plan.order:
+            st = plan.steps[sid]
+            spec = {k: v for k, v in st.items() if k not in ("id", "input", "inputs")}
+            keys[sid] = _digest({"spec": spec, "in": [keys[d] for d in plan.deps[sid]]})
+            if keys[sid] in by_key:
+                ids[sid] = by_key[keys[sid]]
+                shared += 1
+                continue
+            ids[sid] = by_key[keys[sid]] = f"{name}:{sid}"
+            new = {**st, "id": ids[sid]}
+            if "input" in st:
+                new["input"] = ids[st["input"]]
+            if "inputs" in st:
+                new["inputs"] = [ids[i] for i in st["inputs"]]
+            merged.append(new)
+        returns[name] = {r: ids[r] for r in ret}
+    return merged, returns, shared
+
+# ---------------------------------------------------------------------------
+# 2️⃣ᵉ  MEMORY  (copy‑on‑write, peak tracking)
+# ---------------------------------------------------------------------------
+def _enable_cow() -> None:
+    """Turn on pandas copy‑on‑write for the process (always on in pandas 3).
+
+    With CoW, ops can hand out shallow copies/views: a derived frame only
+    materialises the columns it writes, and writes never reach the shared
+    `dfs` tables.  Set globally rather than per run, since an
+    `option_context` would race between concurrent requests."""
+    if int(pd.__version__.split(".")[0]) < 3 and pd.options.mode.copy_on_write is not True:
+        pd.set_option("mode.copy_on_write", True)
+
+
+_TRACE_LOCK = threading.Lock(); _TRACE_USERS = 0
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss() -> Optional[int]:
+    """Resident set size of this process (Linux ``/proc``), else None."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@contextmanager
+def _track_peak(metrics: Dict[str, Any], enabled: bool):
+    """Record the change in process RSS over the block as
+    ``metrics["rss_delta_bytes"]`` (two reads of ``/proc``, so always on),
+    and with *enabled* the traced‑allocation high‑water mark (NumPy and
+    Python objects) as ``metrics["peak_bytes"]``.  tracemalloc slows
+    allocation‑heavy steps by an order of magnitude, so it is for profiling
+    only; both numbers are process‑wide, so concurrent runs inflate each
+    other's."""
+    global _TRACE_USERS
+    rss0 = _rss()
+    if enabled:
+        with _TRACE_LOCK:
+            if _TRACE_USERS == 0:
+                tracemalloc.start()
+            _TRACE_USERS += 1
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+    try:
+        yield
+    finally:
+        if enabled:
+            with _TRACE_LOCK:
+                metrics["peak_bytes"] = max(0, tracemalloc.get_traced_memory()[1] - base)
+                _TRACE_USERS -= 1
+                if _TRACE_USERS == 0:
+                    tracemalloc.stop()
+        rss1 = _rss()
+        if rss0 is not None and rss1 is not None:
+            metrics["rss_delta_bytes"] = rss1 - rss0
+
+# ---------------------------------------------------------------------------
+# 2️⃣ᶠ  MULTI‑WAY JOIN
+# ---------------------------------------------------------------------------
+def _key_index(df: pd.DataFrame, on: List[str]) -> pd.Index:
+    if len(on) == 1:
+        return pd.Index(df[on[0]], name=on[0])
+    return pd.MultiIndex.from_frame(df[on])
+
+
+def _value_cols(frames, on) -> Optional[List[List[str]]]:
+    """Non‑key columns per frame, or None if names clash (pairwise merges
+    would add _x/_y suffixes that depend on join order)."""
+    cols = [[c for c in df.columns if c not in on] for df in frames]
+    flat = [c for cs in cols for c in cs]
+    return cols if len(flat) == len(set(flat)) else None
+
+
+def _multiway_join(frames: List[pd.DataFrame], on: List[str], how: str):
+    """Align all *frames* on one shared key index in a single pass.
+
+    Only applies when every frame has unique, non‑null keys of one dtype and
+    no clashing column names; returns None otherwise.  Matches a chain of
+    pairwise `merge(how=...)`: inner/left keep the first frame's row order,
+    outer sorts the key union."""
+    if how not in ("inner", "left", "outer") or any(c not in df for df in frames for c in on):
+        return None
+    if any(df[c].dtype != frames[0][c].dtype for df in frames[1:] for c in on):
+        return None
+    cols = _value_cols(frames, on)
+    if cols is None:
+        return None
+    idxs = [_key_index(df, on) for df in frames]
+    if any(not ix.is_unique or any(df[c].isna().any() for c in on)
+           for ix, df in zip(idxs, frames)):
+        return None
+
+    if how == "left":
+        keys = idxs[0]
+    elif how == "inner":
+        keys = idxs[0][np.logical_and.reduce([idxs[0].isin(ix) for ix in idxs[1:]])]
+    else:
+        keys = reduce(lambda a, b: a.union(b), idxs[1:], idxs[0]).sort_values()
+    parts = [df[cs].set_axis(ix, axis=0).reindex(keys) for df, cs, ix in zip(frames, cols, idxs)]
+    out = pd.concat(parts, axis=1).reset_index()
+    return out[list(frames[0].columns) + [c for cs in cols[1:] for c in cs]]
+
+
+def _join_rows(frames: List[pd.DataFrame], on: List[str], how: str) -> int:
+    """Rows of the largest frame in the pairwise `merge(how=...)` chain over
+    *frames*, from per‑key row counts alone (without building it), so a
+    fan‑out join can be refused before it allocates."""
+    size = lambda df: df.groupby(on, dropna=False, observed=True).size()
+    acc, most = size(frames[0]), len(frames[0])
+    for df in frames[1:]:
+        n = size(df)
+        if how == "inner":
+            acc = acc.mul(n).dropna()
+        elif how == "left":
+            acc = acc.mul(n.reindex(acc.index), fill_value=1)
+        else:
+            acc = acc.mul(n, fill_value=1)
+        most = max(most, int(acc.sum()))
+    return most
+
+
+def _ordered_inner_join(frames: List[pd.DataFrame], on: List[str]):
+    """Inner join with non‑unique keys: merge the remaining inputs into the
+    first in order of estimated result size (|A|·|B| / max distinct keys),
+    then restore the column and row order of the original pairwise chain."""
+    cols = _value_cols(frames, on)
+    if cols is None or any(c not in df for df in frames for c in on):
+        return None
+    pos = [f"__pos{i}" for i in range(len(frames))]
+    tagged = [df.assign(**{p: np.arange(len(df))}) for df, p in zip(frames, pos)]
+    ndv = [max(len(_key_index(df, on).unique()), 1) for df in frames]
+
+    out, out_rows, out_ndv = tagged[0], len(frames[0]), ndv[0]
+    rest = list(range(1, len(frames)))
+    while rest:
+        est = {i: out_rows * len(frames[i]) / max(out_ndv, ndv[i]) for i in rest}
+        i = min(rest, key=est.__getitem__)
+        out = out.merge(tagged[i], on=on, how="inner")
+        out_rows, out_ndv = len(out), min(out_ndv, ndv[i])
+        rest.remove(i)
+    out = out.sort_values(pos, kind="stable", ignore_index=True)
+    return out[list(frames[0].columns) + [c for cs in cols[1:] for c in cs]]
+
+# ---------------------------------------------------------------------------
+# 2️⃣ᵍ  STREAMING  (out‑of‑core tables, chunked execution)
+# ---------------------------------------------------------------------------
+class ChunkedTable:
+    """A base table too big for memory: one or more CSVs read in chunks.
+
+    Can sit in `dfs` next to DataFrames.  In streaming mode it is scanned
+    chunk by chunk; otherwise `source` materialises it after applying any
+    pushed‑down `where`/`columns`, so only the surviving rows are held."""
+
+    def __init__(self, paths, **read_kw):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.read_kw = read_kw
+
+    @property
+    def columns(self) -> pd.Index:
+        return pd.read_csv(self.paths[0], nrows=0, **self.read_kw).columns
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        return pd.read_csv(self.paths[0], nrows=n, **self.read_kw)
+
+    def iter_chunks(self, chunk_size: int, columns=None) -> Iterator[pd.DataFrame]:
+        offset = 0
+        for path in self.paths:
+            with pd.read_csv(path, chunksize=chunk_size, usecols=columns, **self.read_kw) as rd:
+                for chunk in rd:  # one RangeIndex across all files
+                    yield chunk.set_axis(pd.RangeIndex(offset, offset + len(chunk)))
+                    offset += len(chunk)
+
+
+@dataclass
+class Stream:
+    """A lazily evaluated table.  `chunks()` starts a fresh pass over the
+    source each time, so a stream can feed several consumers."""
+    chunks: Callable[[], Iterator[pd.DataFrame]]
+
+    def map(self, fn) -> "Stream":
+        return Stream(lambda: (fn(c) for c in self.chunks()))
+
+    def collect(self) -> pd.DataFrame:
+        return pd.concat(list(self.chunks()))
+
+    def head(self, n: int) -> pd.DataFrame:
+        """First *n* rows, pulling only as many chunks as that takes."""
+        got, rows = [], 0
+        for c in self.chunks():
+            got.append(c); rows += len(c)
+            if rows >= n:
+                break
+        return pd.concat(got).head(n)
+
+
+def _chunks_of(table, chunk_size: int, columns=None, where=None,
+               sample: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Chunks of a base table with a pushed‑down `where`/`columns` applied.
+    Always yields at least one (possibly empty) chunk, to carry the schema.
+
+    With *sample*, reading stops after that many rows; in‑memory tables are
+    then read in a (seeded, so repeatable) random chunk order, so the rows
+    read are a sample of the whole table rather than its head."""
+    scan = columns
+    if columns is not None and where is not None:
+        scan = columns + sorted(_cond_cols(where) - set(columns))
+    if isinstance(table, ChunkedTable):
+        chunks = table.iter_chunks(chunk_size, scan)
+    else:
+        df = table[scan] if scan is not None else table
+        starts = np.arange(0, max(len(df), 1), chunk_size)
+        if sample is not None and len(df) > sample:
+            starts = np.random.default_rng(0).permutation(starts)
+            chunks = _doubling(df, starts, chunk_size)
+        else:
+            chunks = (df.iloc[lo:lo + chunk_size] for lo in starts)
+    if sample is not None:
+        chunks = _take_rows(chunks, sample)
+    for c in chunks:
+        if where is not None:
+            c = c.loc[_filter_mask(where, c), columns if columns is not None else c.columns]
+        yield c
+
+
+def _doubling(df: pd.DataFrame, starts, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Chunks at *starts*, yielded in groups of 1, 2, 4, … so an early stop
+    reads little while a full scan takes few (per‑chunk overhead) passes."""
+    i, k = 0, 1
+    while i < len(starts):
+        yield pd.concat([df.iloc[lo:lo + chunk_size] for lo in starts[i:i + k]])
+        i += k; k *= 2
+
+
+def _take_rows(chunks: Iterator[pd.DataFrame], n: int) -> Iterator[pd.DataFrame]:
+    for c in chunks:
+        yield c.iloc[:n]
+        n -= len(c)
+        if n <= 0:
+            return
+
+
+# partial state per aggregate fn: how to compute it per chunk / combine it
+_PARTIALS = {"sum": ("sum",), "count": ("count",), "min": ("min",),
+             "max": ("max",), "mean": ("sum", "count")}
+_COMBINE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+def categorize(df: pd.DataFrame, max_ratio: float = _CATEGORY_MAX_RATIO) -> pd.DataFrame:
+    """*df* with its low‑cardinality string columns stored as categoricals
+    (integer codes + one copy of each distinct string), so group‑bys and
+    equality filters on them work on the codes.  Meant for base tables at
+    load time; other columns are shared, not copied."""
+    conv = {}
+    for c in df.columns:
+        x = df[c]
+        if isinstance(x.dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(x.dtype):
+            continue
+        if pd.api.types.infer_dtype(x, skipna=True) == "string" and \
+                x.nunique() <= max_ratio * len(x):
+            conv[c] = x.astype("category")
+    return df.assign(**conv) if conv else df
+
+
+def _plain_keys(out: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """Turn categorical group keys back into their categories' dtype, so
+    results look the same whatever the base tables were stored as."""
+    for c in by:
+        if isinstance(out[c].dtype, pd.CategoricalDtype):
+            out[c] = out[c].astype(out[c].cat.categories.dtype)
+    return out
+
+
+_CODE_AGG_FNS = {"sum", "count", "mean"}
+_CODE_AGG_MAX_KEYS = 1 << 22          # max product of per‑key category counts
+
+
+def _plain_values(df: pd.DataFrame, by: List[str], metrics) -> pd.DataFrame:
+    """*df* with categorical metric columns (other than `count`ed ones) back
+    in their categories' dtype: min/max refuse unordered categoricals, and
+    results shouldn't depend on how the base tables were stored."""
+    conv = {m["col"]: df[m["col"]].astype(df[m["col"]].cat.categories.dtype)
+            for m in metrics.values()
+            if m["fn"] != "count" and m["col"] not in by
+            and isinstance(df[m["col"]].dtype, pd.CategoricalDtype)}
+    return df.assign(**conv) if conv else df
+
+
+def _agg_dtype(col: pd.Series, fn: str):
+    """dtype of ``groupby(...)[col].agg(fn)`` (asked of an empty slice):
+    nullable inputs give Int64/Float64, int32 sums stay int32, etc."""
+    return getattr(col.iloc[:0].groupby(np.zeros(0)), fn)().dtype
+
+
+def _code_agg(df: pd.DataFrame, by: List[str], metrics) -> Optional[pd.DataFrame]:
+    """Group‑by straight on categorical codes: the codes of all keys are
+    packed into one integer per row and sum/count/mean become `np.bincount`
+    calls, skipping pandas' hash factorisation.  Same rows, order and dtypes
+    as the groupby (float sums can differ in the last ulp); None when a key
+    isn't categorical, a fn isn't sum/count/mean or a column isn't numeric."""
+    if not by or any(not isinstance(df[c].dtype, pd.CategoricalDtype) for c in by):
+        return None
+    vals = {m["col"] for m in metrics.values()}
+    if any(m["fn"] not in _CODE_AGG_FNS for m in metrics.values()) or any(
+            not pd.api.types.is_numeric_dtype(df[c]) or isinstance(df[c].dtype, pd.CategoricalDtype)
+            for c in vals):
+        return None
+    sizes = [len(df[c].cat.categories) + 1 for c in by]   # last slot = NaN key
+    if float(np.prod(sizes)) > _CODE_AGG_MAX_KEYS:
+        return None
+    key = np.zeros(len(df), dtype=np.int64)
+    for c, k in zip(by, sizes):
+        codes = df[c].cat.codes.to_numpy().astype(np.int64)
+        key = key * k + np.where(codes < 0, k - 1, codes)
+    n_keys = int(np.prod(sizes))
+    rows = np.bincount(key, minlength=n_keys)
+    seen = np.flatnonzero(rows)
+    keys, rest = {}, seen
+    for c, k in reversed(list(zip(by, sizes))):   # unpack the packed codes
+        codes = rest % k; rest = rest // k
+        keys[c] = pd.Categorical.from_codes(np.where(codes == k - 1, -1, codes),
+                                            dtype=df[c].dtype)
+    out = {c: pd.Series(keys[c]) for c in by}
+    sums, counts = {}, {}
+    for col in vals:
+        x = df[col].to_numpy()
+        valid = ~pd.isna(x) if x.dtype.kind in "fcmMO" else None
+        w = (np.where(valid, x, 0) if valid is not None else x).astype(np.float64)
+        sums[col] = np.bincount(key, weights=w, minlength=n_keys)[seen].astype(np.float64)
+        counts[col] = (np.bincount(key, weights=valid, minlength=n_keys)[seen].astype(np.int64)
+                       if valid is not None else rows[seen])
+    for name, m in metrics.items():
+        col, fn = m["col"], m["fn"]
+        if fn == "count":
+            res = counts[col]
+        elif fn == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                res = sums[col] / np.where(counts[col] > 0, counts[col], np.nan)
+        else:
+            res = sums[col]
+        out[name] = pd.Series(res).astype(_agg_dtype(df[col], fn))   # NaN → NA if nullable
+    return _plain_keys(pd.DataFrame(out), by)
+
+
+def _group_agg(df: pd.DataFrame, by: List[str], metrics: Dict[str, Dict[str, str]]) -> pd.DataFrame:
+    """``groupby(by).agg(**metrics)`` with one pass per distinct fn over all
+    of its columns at once, instead of one per metric.  Categorical keys are
+    grouped on their codes (observed groups only)."""
+    fast = _code_agg(df, by, metrics)
+    if fast is not None:
+        return fast
+    g = _plain_values(df, by, metrics).groupby(by, dropna=False, observed=True)
+    cols: Dict[str, List[str]] = {}
+    for m in metrics.values():
+        cols.setdefault(m["fn"], [])
+        if m["col"] not in cols[m["fn"]]:
+            cols[m["fn"]].append(m["col"])
+    res = {fn: g[cs].agg(fn) for fn, cs in cols.items()}
+    out = pd.DataFrame({name: res[m["fn"]][m["col"]] for name, m in metrics.items()},
+                       index=next(iter(res.values())).index if res else None)
+    return _plain_keys(out.reset_index(), by)
+
+
+def _partial_aggregate(chunks: Iterable[pd.DataFrame], by, metrics, max_rows: int, agg,
+                       check: Optional[Callable[[int], None]] = None):
+    """Group‑by over *chunks* with mergeable partial aggregates; returns the
+    same frame as the one‑shot *agg(df)* (float sums can differ in the last
+    ulp).  Partials are re‑combined whenever they exceed
+    *max_rows*, so memory stays bounded by the chunk size and group count.
+    *check(bytes of partials)* is called after each chunk."""
+    parts = {f"{m['col']}|{p}": (m["col"], p)
+             for m in metrics.values() for p in _PARTIALS[m["fn"]]}
+    combine = {k: (k, _COMBINE[p]) for k, (_, p) in parts.items()}
+    acc, empty = [], None
+    for chunk in chunks:
+        if not len(chunk):
+            empty = chunk
+            continue
+        acc.append(_plain_values(chunk, by, metrics)
+                   .groupby(by, dropna=False, observed=True).agg(**parts).reset_index())
+        if sum(map(len, acc)) > max_rows:
+            acc = [pd.concat(acc).groupby(by, dropna=False, observed=True)
+                   .agg(**combine).reset_index()]
+        if check is not None:
+            check(sum(map(_nbytes, acc)))
+    if not acc:  # nothing survived: aggregate an empty chunk for the schema
+        return agg(empty)
+    tot = pd.concat(acc).groupby(by, dropna=False, observed=True).agg(**combine)
+    out = pd.DataFrame(index=tot.index)
+    for name, m in metrics.items():
+        c, fn = m["col"], m["fn"]
+        out[name] = tot[f"{c}|sum"].div(tot[f"{c}|count"]) if fn == "mean" else tot[f"{c}|{fn}"]
+    return _plain_keys(out.reset_index(), by)
+
+# ---------------------------------------------------------------------------
+# 2️⃣ʰ  EXPLAIN  (row estimates from table statistics, without running)
+# ---------------------------------------------------------------------------
+_COLUMN_STATS: Dict[tuple, Dict[str, Any]] = {}   # (table version, col) -> stats
+
+# selectivity guesses when a column has no usable statistics
+_DEFAULT_SEL = {"=": 0.1, "==": 0.1, "!=": 0.9, "icontains": 0.1, "regex": 0.1,
+                "noticontains": 0.9}
+_RANGE_SEL = 1 / 3
+
+
+def column_stats(df: pd.DataFrame, col: str) -> Dict[str, Any]:
+    """Distinct count and (numeric) min/max of a base‑table column, computed
+    once per table version."""
+    key = (table_version(df), col)
+    st = _COLUMN_STATS.get(key)
+    if st is None:
+        x = df[col]
+        st = {"ndv": int(x.nunique())}
+        if pd.api.types.is_numeric_dtype(x) and not pd.api.types.is_bool_dtype(x) and x.notna().any():
+            st["min"], st["max"] = float(x.min()), float(x.max())
+        st = _COLUMN_STATS[key] = st
+    return st
+
+
+def _selectivity(tree, stats: Callable[[str], Optional[Dict[str, Any]]]) -> float:
+    """Estimated fraction of rows a condition tree keeps (columns assumed
+    independent, values uniform)."""
+    sel = 1.0
+    for node in _conds(tree):
+        op = node.get("op")
+        if op in _OP_BOOL:
+            args = node.get("args", [])
+            parts = [_selectivity(a, stats) for a in (args if isinstance(args, list) else [args])]
+            if op == "and":
+                s = float(np.prod(parts))
+            elif op == "or":
+                s = 1 - float(np.prod([1 - p for p in parts]))
+            else:
+                s = 1 - parts[0]
+        else:
+            st, rhs = stats(node["lhs"]), node.get("rhs")
+            if op in ("=", "==", "!=") and st and st["ndv"]:
+                s = 1 / st["ndv"] if op != "!=" else 1 - 1 / st["ndv"]
+            elif op in ("<", "<=", ">", ">="):
+                s = _RANGE_SEL
+                if st and "min" in st and isinstance(rhs, (int, float)) and st["max"] > st["min"]:
+                    below = (rhs - st["min"]) / (st["max"] - st["min"])
+                    s = below if op in ("<", "<=") else 1 - below
+            else:
+                s = _DEFAULT_SEL.get(op, 0.5)
+        sel *= min(max(s, 0.0), 1.0)
+    return sel
+
+
+# ---------------------------------------------------------------------------
+# 2️⃣ⁱ  RESAMPLING TESTS  (permutation / bootstrap, batched index matrices)
+# ---------------------------------------------------------------------------
+def _batches(n_resamples: int, n: int,
+             check: Optional[Callable[[], None]] = None) -> Iterator[int]:
+    """Batch sizes so each (batch × n) index matrix stays under the cap;
+    *check()* runs before each batch, so a budget can stop a long test."""
+    step = max(1, _RESAMPLE_CELLS // max(n, 1))
+    for lo in range(0, n_resamples, step):
+        if check is not None:
+            check()
+        yield min(step, n_resamples - lo)
+
+
+def _zscore(a: np.ndarray) -> np.ndarray:
+    """Standardise each row of *a* so a row‑wise mean of products is r."""
+    a = a - a.mean(axis=-1, keepdims=True)
+    return a / a.std(axis=-1, keepdims=True)
+
+
+def _resample_data(df: pd.DataFrame, s: Dict[str, Any]):
+    """("groups", [a, b]) for group_col/value_col specs, ("xy", (x, y)) for
+    x/y specs; rows with nulls in the used columns are dropped."""
+    if "x" in s and "y" in s:
+        d = df[[s["x"], s["y"]]].dropna()
+        return "xy", (d[s["x"]].to_numpy(float), d[s["y"]].to_numpy(float))
+    d = df[[s["group_col"], s["value_col"]]].dropna()
+    groups = [g[s["value_col"]].to_numpy(float)
+              for _, g in d.groupby(s["group_col"], observed=True)]
+    if len(groups) != 2:
+        raise ValueError(f"{s['test']} test needs exactly 2 groups in "
+                         f"'{s['group_col']}', got {len(groups)}")
+    return "groups", groups
+
+
+def permutation_test(df: pd.DataFrame, s: Dict[str, Any],
+                     check: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Difference in group means (group_col/value_col) or Pearson r (x/y)
+    against its distribution under random relabelling.  Every batch of
+    permutations is one ``rng.permuted`` index matrix; the statistic is
+    computed for all rows at once."""
+    rng = np.random.default_rng(s.get("seed"))
+    n_res = int(s.get("n_resamples", _RESAMPLES))
+    kind, data = _resample_data(df, s)
+    null = []
+    if kind == "groups":
+        a, b = data
+        v, n1 = np.concatenate([a, b]), len(a)
+        total, n2 = v.sum(), len(b)
+        observed = a.mean() - b.mean()
+        for m in _batches(n_res, len(v), check):
+            idx = rng.permuted(np.tile(np.arange(len(v)), (m, 1)), axis=1)
+            s1 = v[idx[:, :n1]].sum(axis=1)
+            null.append(s1 / n1 - (total - s1) / n2)
+        sizes = {"n1": n1, "n2": n2}
+    else:
+        x, y = map(_zscore, data)
+        observed = float(x @ y) / len(x)
+        for m in _batches(n_res, len(y), check):
+            idx = rng.permuted(np.tile(np.arange(len(y)), (m, 1)), axis=1)
+            null.append(y[idx] @ x / len(x))
+        sizes = {"n": len(x)}
+    null = np.concatenate(null)
+    alt = s.get("alternative", "two-sided")
+    if alt == "greater":
+        extreme = null >= observed
+    elif alt == "less":
+        extreme = null <= observed
+    else:
+        extreme = np.abs(null) >= abs(observed)
+    p = (extreme.sum() + 1) / (n_res + 1)   # observed labelling counts as one
+    return {"statistic": float(observed), "p": float(p), "n_resamples": n_res,
+            "alternative": alt, **sizes}
+
+
+_BOOT_STATS = {"mean": lambda a: a.mean(axis=-1), "median": lambda a: np.median(a, axis=-1)}
+
+
+def bootstrap_test(df: pd.DataFrame, s: Dict[str, Any],
+                   check: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Percentile bootstrap CI for a mean/median (value_col), a difference
+    between two groups (group_col + value_col; groups resampled separately)
+    or Pearson r (x/y; pairs resampled).  Each batch draws one index matrix
+    with ``rng.integers``."""
+    rng = np.random.default_rng(s.get("seed"))
+    n_res = int(s.get("n_resamples", _RESAMPLES))
+    conf = float(s.get("confidence", 0.95))
+    stat = _BOOT_STATS[s.get("statistic", "mean")]
+    if "group_col" in s or ("x" in s and "y" in s):
+        kind, data = _resample_data(df, s)
+    else:
+        kind, data = "one", df[s["value_col"]].dropna().to_numpy(float)
+
+    def draw(v, m):
+        return v[rng.integers(0, len(v), (m, len(v)))]
+
+    boot = []
+    n = len(data[0]) + len(data[1]) if kind != "one" else len(data)
+    for m in _batches(n_res, n, check):
+        if kind == "one":
+            boot.append(stat(draw(data, m)))
+        elif kind == "groups":
+            boot.append(stat(draw(data[0], m)) - stat(draw(data[1], m)))
+        else:
+            idx = rng.integers(0, len(data[0]), (m, len(data[0])))
+            boot.append((_zscore(data[0][idx]) * _zscore(data[1][idx])).mean(axis=1))
+    boot = np.concatenate(boot)
+    if kind == "one":
+        estimate = stat(data)
+    elif kind == "groups":
+        estimate = stat(data[0]) - stat(data[1])
+    else:
+        estimate = float(_zscore(data[0]) @ _zscore(data[1])) / len(data[0])
+    lo, hi = np.nanquantile(boot, [(1 - conf) / 2, (1 + conf) / 2])
+    return {"estimate": float(estimate), "ci_low": float(lo), "ci_high": float(hi),
+            "se": float(np.nanstd(boot, ddof=1)), "confidence": conf, "n_resamples": n_res}
+
+
+# ---------------------------------------------------------------------------
+# 2️⃣ʲ  TEMPORAL JOINS  (as‑of / interval, by sorted search)
+# ---------------------------------------------------------------------------
+def _sortable(x: pd.Series) -> np.ndarray:
+    """Values of a time/number column as float64 for ordering.  Strings are
+    parsed as dates; unparseable or out‑of‑range ones become NaN (so an end
+    date like "9999‑12‑31" that overflows simply reads as open‑ended).
+    Always a fresh array: callers overwrite NaNs in place."""
+    if pd.api.types.is_numeric_dtype(x.dtype) and not pd.api.types.is_bool_dtype(x.dtype):
+        return x.to_numpy(np.float64, na_value=np.nan, copy=True)
+    if not pd.api.types.is_datetime64_any_dtype(x.dtype):
+        x = pd.to_datetime(x, errors="coerce")
+    x = x.dt.tz_convert(None) if getattr(x.dt, "tz", None) is not None else x
+    t = x.to_numpy("datetime64[s]")     # seconds: exact in float64
+    out = t.astype(np.int64).astype(np.float64)
+    out[np.isnat(t)] = np.nan
+    return out
+
+
+def _key_codes(left: pd.DataFrame, right: pd.DataFrame, on: List[str]):
+    """Shared integer codes for the `on` keys of both frames; -1 where any
+    key is null (never matches)."""
+    if not on:
+        return np.zeros(len(left), np.int64), np.zeros(len(right), np.int64)
+    keys = pd.concat([left[on], right[on]], ignore_index=True)
+    codes = keys.groupby(on, sort=False, dropna=False, observed=True).ngroup() \
+        .to_numpy(np.int64, copy=True)
+    codes[keys.isna().any(axis=1).to_numpy()] = -1
+    return codes[:len(left)], codes[len(left):]
+
+
+def _attach(left: pd.DataFrame, right: pd.DataFrame, li: np.ndarray, ri: np.ndarray,
+            on: List[str]) -> pd.DataFrame:
+    """Rows ``left[li]`` side by side with ``right[ri]`` (``ri == -1`` → NaN),
+    right's *on* columns dropped and other clashes suffixed like `merge`."""
+    rcols = [c for c in right.columns if c not in on]
+    clash = set(rcols) & (set(left.columns) - set(on))
+    l = left.iloc[li].reset_index(drop=True).rename(columns={c: f"{c}_x" for c in clash})
+    r = right[rcols].reset_index(drop=True).reindex(ri).reset_index(drop=True) \
+        .rename(columns={c: f"{c}_y" for c in clash})
+    return pd.concat([l, r], axis=1)
+
+
+def _with_unmatched(n_left: int, li: np.ndarray, ri: np.ndarray):
+    """Add ``(row, -1)`` for every left row without a match, in left order."""
+    miss = np.flatnonzero(np.bincount(li, minlength=n_left) == 0)
+    li = np.concatenate([li, miss]); ri = np.concatenate([ri, np.full(len(miss), -1)])
+    order = np.argsort(li, kind="stable")
+    return li[order], ri[order]
+
+
+def interval_join(left: pd.DataFrame, right: pd.DataFrame, on: List[str], left_on: str,
+                  start: str, end: str, how: str = "left", closed: str = "both") -> pd.DataFrame:
+    """Each left row joined to every right row with the same `on` keys whose
+    [`start`, `end`] interval contains ``left[left_on]``.
+
+    Intervals are sorted by (key, start) once; each row's candidates are the
+    slice between two `searchsorted`s – the last start ≤ t, and the first
+    interval whose running max end ≥ t – so the cost is O((n + m) log m +
+    matches) rather than a key merge followed by a filter.  Overlapping
+    intervals yield one row each.  A missing start/end is open‑ended;
+    `closed` is "both", "left", "right" or "neither"; `how` "left" keeps
+    unmatched rows.  Left row order is preserved."""
+    if closed not in ("both", "left", "right", "neither") or how not in ("left", "inner"):
+        raise ValueError("interval_join: closed must be both/left/right/neither, how left/inner")
+    lk, rk = _key_codes(left, right, on)
+    t = _sortable(left[left_on])
+    rs, re_ = _sortable(right[start]), _sortable(right[end])
+    rs[np.isnan(rs)], re_[np.isnan(re_)] = -np.inf, np.inf
+    order = np.lexsort((rs, rk))
+    rk, rs, re_ = rk[order], rs[order], re_[order]
+    reach = pd.Series(re_).groupby(rk).cummax().to_numpy()   # running max end per key
+    # dense ranks of every value turn (key, value) pairs into sortable int64s
+    vals, inv = np.unique(np.concatenate([rs, reach, np.nan_to_num(t)]), return_inverse=True)
+    width = len(vals) + 1
+    m = len(rs)
+    c_start = rk * width + inv[:m]
+    c_reach = rk * width + inv[m:2 * m]
+    c_t = lk * width + inv[2 * m:]
+    hi = np.searchsorted(c_start, c_t, "right" if closed in ("both", "left") else "left")
+    lo = np.searchsorted(c_reach, c_t, "left" if closed in ("both", "right") else "right")
+    n = np.where((lk >= 0) & ~np.isnan(t), np.maximum(hi - lo, 0), 0)
+    li = np.repeat(np.arange(len(left)), n)
+    ri = np.repeat(lo, n) + (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n))
+    ok = re_[ri] >= t[li] if closed in ("both", "right") else re_[ri] > t[li]
+    li, ri = li[ok], order[ri[ok]]
+    if how == "left":
+        li, ri = _with_unmatched(len(left), li, ri)
+    return _attach(left, right, li, ri, on)
+
+
+def asof_join(left: pd.DataFrame, right: pd.DataFrame, on: List[str], left_on: str,
+              right_on: Optional[str] = None, direction: str = "backward",
+              how: str = "left") -> pd.DataFrame:
+    """Each left row joined to the right row with the same `on` keys whose
+    `right_on` is nearest to ``left[left_on]`` in `direction`
+    ("backward": last ≤, "forward": first ≥, "nearest"), like
+    `pd.merge_asof` but in left row order, null‑safe and with `how`."""
+    if direction not in ("backward", "forward", "nearest") or how not in ("left", "inner"):
+        raise ValueError("asof_join: direction must be backward/forward/nearest, how left/inner")
+    lk, rk = _key_codes(left, right, on)
+    t, rt = _sortable(left[left_on]), _sortable(right[right_on or left_on])
+    lrows = np.flatnonzero((lk >= 0) & ~np.isnan(t))
+    rrows = np.flatnonzero((rk >= 0) & ~np.isnan(rt))
+    l = pd.DataFrame({"k": lk[lrows], "t": t[lrows], "li": lrows}).sort_values("t", kind="stable")
+    r = pd.DataFrame({"k": rk[rrows], "t": rt[rrows], "ri": rrows}).sort_values("t", kind="stable")
+    hit = pd.merge_asof(l, r, on="t", by="k", direction=direction).dropna(subset=["ri"])
+    li, ri = hit["li"].to_numpy(np.int64), hit["ri"].to_numpy(np.int64)
+    o = np.argsort(li, kind="stable")
+    li, ri = li[o], ri[o]
+    if how == "left":
+        li, ri = _with_unmatched(len(left), li, ri)
+    same = [left_on] if (right_on or left_on) == left_on else []  # one time column, as merge_asof
+    return _attach(left, right, li, ri, on + same)
+
+
+# ---------------------------------------------------------------------------
+# 2️⃣ᵏ  BUDGETS  (time / memory limits, cooperative cancellation)
+# ---------------------------------------------------------------------------
+class PipelineAborted(Exception):
+    """A run stopped early.  `step` is the step that was executing (for a
+    streamed chain, the step consuming the chunks)."""
+    reason = "aborted"
+
+    def __init__(self, step: Optional[str], limit=None, used=None):
+        self.step, self.limit, self.used = step, limit, used
+        detail = f" ({used} > {limit})" if limit is not None else ""
+        super().__init__(f"pipeline {self.reason} at step {step!r}{detail}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"error": self.reason, "step": self.step, "limit": self.limit,
+                "used": self.used, "message": str(self)}
+
+
+class BudgetExceeded(PipelineAborted):
+    def __init__(self, kind: str, step, limit, used):
+        self.reason = f"{kind}_budget_exceeded"      # time_… / memory_…
+        super().__init__(step, limit, used)
+
+
+class Cancelled(PipelineAborted):
+    reason = "cancelled"
+
+
+class CancelToken:
+    """Set by `cancel()`, or once *probe* (e.g. "has the client hung up?")
+    returns True; the probe is polled at most every `interval` seconds."""
+
+    def __init__(self, probe: Optional[Callable[[], bool]] = None, interval: float = 0.25):
+        self.probe, self.interval = probe, interval
+        self._set, self._polled = threading.Event(), 0.0
+
+    def cancel(self) -> None:
+        self._set.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._set.is_set() and self.probe is not None:
+            now = time.monotonic()
+            if now - self._polled >= self.interval:
+                self._polled = now
+                if self.probe():
+                    self._set.set()
+        return self._set.is_set()
+
+
+@dataclass
+class Budget:
+    """Limits for one run: wall *seconds* since `start`, and *max_bytes* held
+    by the run's materialised step outputs (plus the chunk / partial state
+    being worked on).  Counting the run's own frames, rather than process
+    RSS or tracemalloc, keeps the check cheap and unaffected by concurrent
+    requests; a single op can still overshoot before the next check."""
+    seconds: Optional[float] = None
+    max_bytes: Optional[int] = None
+    cancel: Optional[CancelToken] = None
+    _t0: float = field(default=0.0, init=False, repr=False)
+    _held: int = field(default=0, init=False, repr=False)
+    _tripped: bool = field(default=False, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def start(self) -> None:
+        self._t0, self._held, self._tripped = time.monotonic(), 0, False
+
+    def hold(self, nbytes: int) -> None:
+        with self._lock:
+            self._held += nbytes
+
+    def check(self, step: Optional[str], extra_bytes: int = 0) -> None:
+        """Raise if cancelled or over a limit.  Once one check has failed,
+        every later one does too, so parallel branches stop as well."""
+        if self._tripped or (self.cancel is not None and self.cancel.cancelled):
+            raise Cancelled(step)
+        err = None
+        if self.seconds is not None:
+            used = time.monotonic() - self._t0
+            if used > self.seconds:
+                err = BudgetExceeded("time", step, self.seconds, round(used, 3))
+        if err is None and self.max_bytes is not None and self._held + extra_bytes > self.max_bytes:
+            err = BudgetExceeded("memory", step, self.max_bytes, self._held + extra_bytes)
+        if err is not None:
+            self._tripped = True
+            raise err
+
 
 # ---------------------------------------------------------------------------
 # 3️⃣  PIPELINE EXECUTOR
@@ -227,67 +1708,388 @@ class Runner:
     steps: List[Dict[str, Any]]
     dfs: Dict[str, pd.DataFrame]
     env: Dict[str, Any] = None
+    cache: Optional[StepCache] = None
+    keys: Dict[str, str] = field(default_factory=dict)
+    plan: Optional[Plan] = None
+    max_workers: int = _MAX_WORKERS
+    votes: Optional[VoteFetcher] = None       # default: module‑level VOTES
+    copy_on_write: bool = True
+    optimize: bool = True
+    track_memory: bool = False
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    streaming: bool = False
+    chunk_size: int = _CHUNK_ROWS
+    profile: bool = False                     # per‑step timings → metrics["profile"]
+    session: Optional["Session"] = None       # previous run's outputs, reused by key
+    reused: List[str] = field(default_factory=list)   # steps served by `session`
+    preview: Optional[int] = None             # rows per returned step (preview mode)
+    budget: Optional[Budget] = None           # time/memory limits, cancellation
+    progress: Optional[Callable[[str, int, int], None]] = None  # (step, done, total)
+    _prof: Dict[str, Dict[str, Any]] = field(default_factory=dict, init=False, repr=False)
+    _timed: bool = field(default=False, init=False, repr=False)   # this run's steps are timed
+    _local: threading.local = field(default_factory=threading.local, init=False, repr=False)
 
     # ------------------------------------------------ run
     def run(self, return_ids: List[str]):
-        self.env = {}
-        for step in self.steps:
-            self.env[step["id"]] = getattr(self, f"op_{step['op']}")(step)
-        return {k: self.env[k] for k in return_ids}
+        self.env, self._prof, self.reused = {}, {}, []
+        self._timed = self.profile or (_PROFILE_SAMPLE > 0 and random.random() < _PROFILE_SAMPLE
+                                       and _PROFILE_LOG.isEnabledFor(logging.INFO))
+        t0 = time.perf_counter()
+        self._build(return_ids)
+        if self.budget is not None:
+            self.budget.start()
+        if self.copy_on_write:
+            _enable_cow()
+        with _track_peak(self.metrics, self.track_memory):
+            if self.max_workers > 1 and len(self.plan.order) > 1:
+                self._run_parallel()
+            else:
+                for i, sid in enumerate(self.plan.order, 1):
+                    self.env[sid] = self._exec(self.plan.steps[sid])
+                    if self.progress is not None:
+                        self.progress(sid, i, len(self.plan.order))
+            out = {}
+            for k in return_ids:   # streams end here
+                self._local.step = k
+                out[k] = self._head(k, self.preview) if self.preview is not None else self._input(k)
+            if self.preview is not None:
+                self.metrics["preview"] = {"limit": self.preview, "scan_rows": _PREVIEW_SCAN,
+                                           "approximate": self._approximate()}
+        if self._timed:
+            self._report(time.perf_counter() - t0)
+        return out
+
+    def _head(self, sid, n: int):
+        v = self.env[sid]
+        if isinstance(v, Stream):
+            return v.head(n)   # filters upstream stop once n rows match
+        return v.head(n) if isinstance(v, (pd.DataFrame, pd.Series)) else v
+
+    def _approximate(self) -> List[str]:
+        """Steps (preview mode) whose values are estimates: aggregates and
+        stat tests over a source that wasn't read in full, joins with more
+        than one sampled input (a join of two samples misses matches, even
+        of one source with itself), and everything computed from them."""
+        sampled: Dict[str, set] = {}     # step -> sampled sources upstream
+        approx: Dict[str, bool] = {}
+        for sid in self.plan.order:
+            s, deps = self.plan.steps[sid], self.plan.deps[sid]
+            if s["op"] == "source":
+                t = self.dfs[s["table"]]
+                partial = not isinstance(t, pd.DataFrame) or len(t) > _PREVIEW_SCAN
+                sampled[sid] = {sid} if partial else set()
+            else:
+                sampled[sid] = set().union(*(sampled[d] for d in deps))
+            approx[sid] = any(approx[d] for d in deps) or \
+                sum(bool(sampled[d]) for d in deps) > 1 or (
+                bool(sampled[sid]) and s["op"] in ("aggregate", "stat_test"))
+        return [sid for sid in self.plan.order if approx[sid]]
+
+    def _build(self, return_ids: List[str]) -> Plan:
+        self.plan = build_plan(self.steps, return_ids)
+        for sid in self.plan.order:
+            s = self.plan.steps[sid]
+            if not hasattr(Runner, f"op_{s.get('op')}"):
+                raise ValueError(f"step '{sid}' has unknown op {s.get('op')!r}")
+            if s["op"] == "source" and s["table"] not in self.dfs:
+                raise ValueError(f"step '{sid}' reads unknown table '{s['table']}'")
+        if self.optimize:
+            optimize_plan(self.plan, lambda t: self.dfs[t].columns)
+        return self.plan
+
+    def explain(self, return_ids: List[str]) -> Dict[str, Any]:
+        """The plan `run` would execute, without running it: step DAG,
+        pruned steps, rewrites (pushed‑down `where`, projected `columns`),
+        estimated rows, whether each step is already in the cache and which
+        division ids would be downloaded."""
+        p = self._build(return_ids)
+        votes = self.votes or VOTES
+        rows: Dict[str, Optional[int]] = {}
+        base: Dict[str, Any] = {}       # step -> base table its columns come from
+        out = []
+        for sid in p.order:
+            s, ins = p.steps[sid], p.deps[sid]
+            table = self.dfs[s["table"]] if s["op"] == "source" else \
+                next((base[i] for i in ins if base.get(i) is not None), None)
+            base[sid] = table if s["op"] in ("source", "filter", "mutate", "join") else None
+
+            def col_stats(col, table=table):
+                if isinstance(table, pd.DataFrame) and col in table.columns:
+                    return column_stats(table, col)
+                return None
+
+            ent: Dict[str, Any] = {"id": sid, "op": s["op"], "inputs": ins}
+            n_in = [rows[i] for i in ins]
+            est = None
+            if s["op"] == "source":
+                ent["table"] = s["table"]
+                est = len(table) if isinstance(table, pd.DataFrame) else None
+                for k in ("where", "columns"):
+                    if k in s:
+                        ent[k] = s[k]
+                if est is not None and "where" in s:
+                    est = _selectivity(s["where"], col_stats) * est
+            elif None in n_in:
+                est = None
+            elif s["op"] == "filter":
+                ent["conditions"] = s["conditions"]
+                est = _selectivity(s["conditions"], col_stats) * n_in[0]
+            elif s["op"] == "mutate":
+                est = n_in[0]
+            elif s["op"] == "aggregate":
+                ndv = [col_stats(c) for c in s["group"]]
+                est = n_in[0] if None in ndv else min(n_in[0], float(np.prod([d["ndv"] for d in ndv])))
+            elif s["op"] == "join":
+                est = {"inner": min, "left": lambda r: r[0]}.get(s.get("how", "inner"), max)(n_in)
+            elif s["op"] in ("asof_join", "interval_join"):
+                est = n_in[0]
+            if s["op"] == "division_votes":
+                missing = [d for d in dict.fromkeys(s["division_ids"])
+                           if not votes.is_cached(d, s["house"])]
+                ent["network"] = missing
+                if not missing:
+                    got = votes.fetch_many(s["division_ids"], s["house"]).values()
+                    est = len(set().union(*(v["member_id"] for v in got)))
+            rows[sid] = None if est is None else int(round(est))
+            ent["est_rows"] = rows[sid]
+            if self.cache is not None:
+                self.keys[sid] = self._key(s)
+                ent["cached"] = self.keys[sid] in self.cache
+                if ent["cached"] and s["op"] == "division_votes":
+                    ent["network"] = []
+            out.append(ent)
+        return {"steps": out, "order": p.order, "pruned": p.pruned,
+                "rewrites": p.rewrites, "returns": p.returns,
+                "network": [e["id"] for e in out if e.get("network")]}
+
+    def _report(self, wall: float):
+        """Log each step's timings (plan order) as one JSON line on the
+        ``dsl.profile`` logger and, with `profile`, return them in
+        ``metrics["profile"]``."""
+        run_id = uuid.uuid4().hex
+        steps = [self._prof[sid] for sid in self.plan.order if sid in self._prof]
+        if self.profile:
+            self.metrics["profile"] = {"run_id": run_id, "wall_s": round(wall, 6),
+                                       "pruned": sorted(self.plan.pruned), "steps": steps}
+        if _PROFILE_LOG.isEnabledFor(logging.INFO):
+            for st in steps:
+                _PROFILE_LOG.info(json.dumps({"event": "dsl.step", "run_id": run_id, **st},
+                                             default=str))
+
+    def _run_parallel(self):
+        """Run every step whose inputs are ready on a thread pool.  Each output
+        depends only on its inputs, so results don't depend on timing."""
+        p = self.plan
+        waiting = {sid: set(p.deps[sid]) for sid in p.order}
+        users: Dict[str, List[str]] = {sid: [] for sid in p.order}
+        for sid in p.order:
+            for d in waiting[sid]:
+                users[d].append(sid)
+        with ThreadPoolExecutor(self.max_workers, thread_name_prefix="dsl") as pool:
+            running = {}
+            def submit_ready():
+                for sid in p.order:  # plan order → deterministic submission
+                    if not waiting.get(sid, True):
+                        del waiting[sid]
+                        running[pool.submit(self._exec, p.steps[sid])] = sid
+            submit_ready()
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    sid = running.pop(fut)
+                    try:
+                        self.env[sid] = fut.result()
+                    except BaseException:
+                        for f in running:
+                            f.cancel()
+                        raise
+                    if self.progress is not None:
+                        self.progress(sid, len(self.env), len(p.order))
+                    for u in users[sid]:
+                        waiting[u].discard(sid)
+                submit_ready()
+
+    def _key(self, s) -> str:
+        """Content hash of a step: its spec (minus ids) + its inputs' hashes
+        (+ the base‑table version for sources)."""
+        spec = {k: v for k, v in s.items() if k not in ("id", "input", "inputs")}
+        ins = [s["input"]] if "input" in s else list(s.get("inputs", []))
+        payload = {"spec": spec, "in": [self.keys[i] for i in ins]}
+        if s["op"] == "source":
+            payload["table"] = table_version(self.dfs[s["table"]])
+        return _digest(payload)
+
+    def _check(self, sid: Optional[str] = None, extra_bytes: int = 0):
+        """Raise `PipelineAborted` if the run is over budget or cancelled;
+        *sid* defaults to the step this thread is executing."""
+        if self.budget is not None:
+            self.budget.check(sid or getattr(self._local, "step", None), extra_bytes)
+
+    def _mask_check(self) -> Optional[Callable[[], None]]:
+        """`_check` for ops that loop inside one step (filter mask slices,
+        resampling batches); None without a budget."""
+        return self._check if self.budget is not None else None
+
+    def _exec(self, s):
+        if self.budget is None:
+            return self._profiled(s)[0]
+        self._local.step = s["id"]
+        self._check()
+        val, hit = self._profiled(s)
+        if isinstance(val, Stream):
+            # chunks are produced while a later step consumes them: check
+            # each one, charged to whichever step is pulling
+            keep = self.budget.max_bytes is not None
+            def guard(c):
+                self._check(extra_bytes=_nbytes(c) if keep else 0)
+                return c
+            return val.map(guard)
+        if self.budget.max_bytes is not None and not hit:
+            # cached / session outputs are already resident, and columns
+            # shared with the base tables (shallow `source` copies) are free
+            self.budget.hold(_owned_nbytes(val, _base_buffers(self.dfs)))
+        self._check()
+        return val
+
+    def _profiled(self, s):
+        """(output, cache hit?) of step *s*, timed if this run is."""
+        if not self._timed:
+            return self._cached(s)
+        prof = self._prof[s["id"]] = {"id": s["id"], "op": s["op"]}
+        ins = [s["input"]] if "input" in s else list(s.get("inputs", []))
+        t0, c0 = time.perf_counter(), time.thread_time()
+        val, hit = self._cached(s)
+        prof.update(wall_s=round(time.perf_counter() - t0, 6),
+                    cpu_s=round(time.thread_time() - c0, 6),  # this thread only
+                    rows_in=sum(_rows(self.env[i]) or 0 for i in ins) if ins else None,
+                    rows_out=_rows(val),
+                    cache=None if hit is None else ("hit" if hit else "miss"))
+        if isinstance(val, Stream):
+            prof["streamed"] = True   # work happens in the consumer
+        elif self.profile:
+            prof["bytes_out"] = _nbytes(val)
+        return val, hit
+
+    def _cached(self, s):
+        """(output, cache hit?) for step *s*; hit is None without a cache."""
+        fn = getattr(self, f"op_{s['op']}")
+        if self.cache is None and self.session is None:
+            return fn(s), None
+        key = self.keys[s["id"]] = self._key(s)
+        if self.session is not None:
+            hit, val = self.session.lookup(s["id"], key)
+            if hit:
+                self.reused.append(s["id"])
+                return val, True
+        if self.cache is None:
+            return fn(s), None
+        hit, val = self.cache.get(key)
+        if not hit:
+            val = fn(s)
+            if not isinstance(val, Stream):  # only materialised results
+                self.cache.put(key, val, _owned_nbytes(val, _base_buffers(self.dfs)))
+        return val, hit
+
+    def _input(self, sid):
+        """Materialised output of step *sid* (collects streams)."""
+        v = self.env[sid]
+        return v.collect() if isinstance(v, Stream) else v
 
     # ------------------------------------------------ op impls
     def op_source(self, s):
-        return self.dfs[s["table"]].copy()
+        df = self.dfs[s["table"]]
+        cols = s.get("columns")
+        if self.streaming:
+            sample = _PREVIEW_SCAN if self.preview is not None else None
+            return Stream(lambda: _chunks_of(df, self.chunk_size, cols, s.get("where"), sample))
+        if isinstance(df, ChunkedTable):
+            parts = []
+            for c in _chunks_of(df, self.chunk_size, cols, s.get("where")):
+                self._check()
+                parts.append(c)
+            return pd.concat(parts)
+        if "where" in s:  # pushed‑down filter: mask the scan, copy only survivors
+            mask = _filter_mask(s["where"], df, self._mask_check())
+            out = df.loc[mask, cols] if cols is not None else df[mask]
+        elif cols is not None:
+            out = df[cols]
+        else:
+            # under CoW a shallow copy shares column buffers until one is written
+            return df.copy(deep=not self.copy_on_write)
+        return out if self.copy_on_write else out.copy()
 
     def op_filter(self, s):
-        df = self.env[s["input"]]
-        cond_tree = s["conditions"]
-        # Back‑compat: if a list → implicit AND of list elements
-        if isinstance(cond_tree, list):
-            mask = np.logical_and.reduce([_cond_series(c, df) for c in cond_tree])
-        else:  # dict expression tree
-            mask = _cond_series(cond_tree, df)
-        return df[mask].copy()
+        def run(df, check=None):
+            out = df[_filter_mask(s["conditions"], df, check)]
+            return out if self.copy_on_write else out.copy()
+        src = self.env[s["input"]]
+        return src.map(run) if isinstance(src, Stream) else run(src, self._mask_check())
 
     def op_mutate(self, s):
-        df = self.env[s["input"]].copy()
-        for col, expr in s["cols"].items():
-            df[col] = eval_expr_df(expr, df)
-        return df
+        def run(df):
+            df = df.copy(deep=not self.copy_on_write)
+            for col, expr in s["cols"].items():
+                df[col] = eval_expr_df(expr, df)
+            return df
+        src = self.env[s["input"]]
+        return src.map(run) if isinstance(src, Stream) else run(src)
 
     def op_aggregate(self, s):
-        df = self.env[s["input"]]
         by = s["group"]
-        agg_dict = {}
-        for name, spec in s["metrics"].items():
-            fn = spec["fn"]; col = spec["col"]
-            agg_dict[name] = (col, fn)
-        out = df.groupby(by, dropna=False).agg(**agg_dict).reset_index()
-        return out
+        agg = lambda df: _group_agg(df, by, s["metrics"])
+        src = self.env[s["input"]]
+        if isinstance(src, Stream) and all(m["fn"] in _PARTIALS for m in s["metrics"].values()):
+            check = (lambda n: self._check(extra_bytes=n)) if self.budget is not None else None
+            return _partial_aggregate(src.chunks(), by, s["metrics"], self.chunk_size, agg, check)
+        return agg(self._input(s["input"]))
 
     def op_join(self, s):
-        inputs = [self.env[x] for x in s["inputs"]]
+        inputs = [self._input(x) for x in s["inputs"]]
+        on, how = s["on"], s.get("how", "outer")
+        if self.budget is not None and self.budget.max_bytes is not None:
+            row_bytes = sum(_nbytes(df) / max(len(df), 1) for df in inputs)
+            self._check(extra_bytes=int(_join_rows(inputs, on, how) * row_bytes))
+        if len(inputs) > 2:
+            out = _multiway_join(inputs, on, how)
+            if out is None and how == "inner":
+                out = _ordered_inner_join(inputs, on)
+            if out is not None:
+                return out
         out = inputs[0]
         for df in inputs[1:]:
-            out = out.merge(df, on=s["on"], how=s.get("how", "outer"))
+            self._check()
+            out = out.merge(df, on=on, how=how)
         return out
 
+    def op_interval_join(self, s):
+        left, right = (self._input(x) for x in s["inputs"])
+        return interval_join(left, right, s.get("on", []), s["left_on"], s["start"], s["end"],
+                             how=s.get("how", "left"), closed=s.get("closed", "both"))
+
+    def op_asof_join(self, s):
+        left, right = (self._input(x) for x in s["inputs"])
+        return asof_join(left, right, s.get("on", []), s["left_on"], s.get("right_on"),
+                         direction=s.get("direction", "backward"), how=s.get("how", "left"))
+
     def op_division_votes(self, s):
+        timings = self._prof[s["id"]].setdefault("fetches", []) if self._timed else None
+        votes = (self.votes or VOTES).fetch_many(s["division_ids"], s["house"], timings)
         frames = []
         for div_id in s["division_ids"]:
-            votes = _fetch_votes(div_id, s["house"])
-            col = f"division_{div_id}"
-            votes[col] = votes["vote"].map(s["weights"]).fillna(0)
-            frames.append(votes[["member_id", col]])
+            v, col = votes[div_id], f"division_{div_id}"
+            frames.append(pd.DataFrame({"member_id": v["member_id"],
+                                        col: v["vote"].map(s["weights"]).fillna(0)}))
         out = frames[0]
         for f in frames[1:]:
+            self._check()
             out = out.merge(f, on="member_id", how="outer")
         return out.fillna(0)
 
     def op_stat_test(self, s):
-        df = self.env[s["input"]]
+        df = self._input(s["input"])
         if s["test"] == "t":
-            g1, g2 = [g[s["value_col"]].values for _, g in df.groupby(df[s["group_col"]])]
+            g1, g2 = [g[s["value_col"]].values
+                      for _, g in df.groupby(df[s["group_col"]], observed=True)]
             t, p = stats.ttest_ind(g1, g2, equal_var=False)
             return {"t": float(t), "p": float(p), "n1": len(g1), "n2": len(g2)}
         if s["test"] == "pearson":
@@ -297,16 +2099,188 @@ class Runner:
             y, X = df[s["y"]], sm.add_constant(df[s["X"]])
             res = sm.OLS(y, X, missing="drop").fit()
             return {"coef": res.params.to_dict(), "p": res.pvalues.to_dict(), "r2": res.rsquared}
+        if s["test"] == "permutation":
+            return permutation_test(df, s, self._mask_check())
+        if s["test"] == "bootstrap":
+            return bootstrap_test(df, s, self._mask_check())
         raise ValueError("unknown stat test")
 
+# ---------------------------------------------------------------------------
+# 3️⃣ᵇ  SESSIONS  (incremental re‑execution for the pipeline builder)
+# ---------------------------------------------------------------------------
+@dataclass
+class Session:
+    """The last run of one builder session: ``step id -> (key, output,
+    bytes it owns)``.  A step whose key is unchanged is reused; since a key covers
+    the inputs' keys, an edit invalidates exactly that step and its
+    descendants."""
+    outputs: Dict[str, tuple] = field(default_factory=dict)
+    last_used: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(e[2] for e in self.outputs.values())
+
+    def lookup(self, sid: str, key: str):
+        ent = self.outputs.get(sid)
+        return (True, ent[1]) if ent is not None and ent[0] == key else (False, None)
+
+    def update(self, runner: Runner):
+        """Keep the materialised outputs of *runner*'s plan, replacing the
+        previous run's (steps no longer in the plan are dropped)."""
+        new, shared = {}, None
+        for sid in runner.plan.order:
+            key, val = runner.keys.get(sid), runner.env.get(sid)
+            if key is None or isinstance(val, Stream):
+                continue
+            old = self.outputs.get(sid)
+            if old is None or old[0] != key:
+                shared = _base_buffers(runner.dfs) if shared is None else shared
+                old = (key, val, _owned_nbytes(val, shared))   # base‑table columns are free
+            new[sid] = old
+        self.outputs = new
+
+
+class SessionStore:
+    """Sessions by id, dropped after `ttl` idle seconds; least recently used
+    ones are evicted while all sessions together hold over `max_bytes`."""
+
+    def __init__(self, ttl: float = _SESSION_TTL, max_bytes: int = _SESSION_BYTES):
+        self.ttl, self.max_bytes = ttl, max_bytes
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, session_id: str):
+        """Hold session *session_id* (created if new) for one run; runs of
+        the same session are serialised."""
+        with self._lock:
+            self._expire()
+            sess = self._sessions.pop(session_id, None) or Session()
+            self._sessions[session_id] = sess        # most recently used last
+        with sess.lock:
+            try:
+                yield sess
+            finally:
+                sess.last_used = time.monotonic()
+        with self._lock:
+            self._trim()
+
+    def _expire(self):
+        now = time.monotonic()
+        for sid in [k for k, v in self._sessions.items() if now - v.last_used > self.ttl]:
+            del self._sessions[sid]
+
+    def _trim(self):
+        total = sum(v.nbytes for v in self._sessions.values())
+        while total > self.max_bytes and self._sessions:
+            _, old = self._sessions.popitem(last=False)
+            total -= old.nbytes
+
+    def drop(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_bytes": self.max_bytes,
+                    "bytes": sum(v.nbytes for v in self._sessions.values())}
+
+
+SESSIONS = SessionStore()
+
 # ---------------------------------------------------------------------------
 # 4️⃣  PUBLIC ENTRY
 # ---------------------------------------------------------------------------
 
-def run_pipeline(dsl: Dict[str, Any], dfs: Dict[str, pd.DataFrame]):
-    runner = Runner(steps=dsl["steps"], dfs=dfs)
-    return runner.run(dsl.get("return", [dsl["steps"][-1]["id"]]))
+def run_pipeline(dsl: Dict[str, Any], dfs: Dict[str, pd.DataFrame],
+                 cache: Optional[StepCache] = STEP_CACHE,
+                 max_workers: int = _MAX_WORKERS,
+                 metrics: Optional[Dict[str, Any]] = None,
+                 streaming: bool = False, profile: bool = False,
+                 session: Optional[str] = None, preview: Optional[int] = None,
+                 budget: Optional[Budget] = None,
+                 progress: Optional[Callable[[str, int, int], None]] = None,
+                 track_memory: bool = False):
+    """Run *dsl* against *dfs*.  Pass a dict as *metrics* to have run metrics
+    (``rss_delta_bytes``; ``peak_bytes`` if *track_memory*, which turns on
+    tracemalloc; ``profile`` if *profile*) written into it.  With a
+    *session* id, steps unchanged since that session's last run are reused
+    (``metrics["session"]`` lists reused and recomputed steps).
+
+    *preview* = n runs on a sample instead: each source reads at most
+    `_PREVIEW_SCAN` rows (random chunks), returned steps stop at n rows and
+    ``metrics["preview"]["approximate"]`` lists aggregates computed from a
+    sample.  Nothing is cached and sessions are bypassed.
+
+    With a *budget*, the run raises `BudgetExceeded` (naming the step) once
+    over its time/memory limit, or `Cancelled` when its token is set; both
+    are checked between steps and per chunk.  *progress(step, done, total)*
+    is called as each step finishes."""
+    if preview is not None:
+        runner = Runner(steps=dsl["steps"], dfs=dfs, cache=None, max_workers=max_workers,
+                        track_memory=track_memory, profile=profile, streaming=True,
+                        chunk_size=_PREVIEW_CHUNK, preview=preview, budget=budget,
+                        progress=progress)
+        session = None
+    else:
+        runner = Runner(steps=dsl["steps"], dfs=dfs, cache=cache,
+                        max_workers=max_workers, track_memory=track_memory,
+                        streaming=streaming, profile=profile, budget=budget,
+                        progress=progress)
+    return_ids = dsl.get("return", [dsl["steps"][-1]["id"]])
+    if session is None:
+        out = runner.run(return_ids)
+    else:
+        with SESSIONS.open(session) as sess:
+            runner.session = sess
+            out = runner.run(return_ids)
+            sess.update(runner)
+        reused = set(runner.reused)
+        runner.metrics["session"] = {
+            "reused": [sid for sid in runner.plan.order if sid in reused],
+            "recomputed": [sid for sid in runner.plan.order if sid not in reused]}
+    if metrics is not None:
+        metrics.update(runner.metrics)
+    return out
+
+
+def run_batch(dsls, dfs: Dict[str, pd.DataFrame],
+              cache: Optional[StepCache] = STEP_CACHE,
+              max_workers: int = _MAX_WORKERS,
+              metrics: Optional[Dict[str, Any]] = None,
+              budget: Optional[Budget] = None,
+              track_memory: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Run several DSL documents (a dict by name, or a list named "0", "1",
+    …) as one merged graph: shared sources/filters/… are computed once and
+    independent branches run in parallel.  Returns ``{name: {return id:
+    value}}``; ``metrics["batch"]`` counts steps and shared steps."""
+    if isinstance(dsls, list):
+        dsls = {str(i): d for i, d in enumerate(dsls)}
+    steps, returns, shared = merge_pipelines(dsls)
+    runner = Runner(steps=steps, dfs=dfs, cache=cache, max_workers=max_workers,
+                    track_memory=track_memory, budget=budget)
+    out = runner.run(list(dict.fromkeys(m for r in returns.values() for m in r.values())))
+    if metrics is not None:
+        metrics.update(runner.metrics, batch={"pipelines": len(dsls), "steps": len(steps),
+                                              "shared": shared})
+    return {name: {r: out[m] for r, m in ret.items()} for name, ret in returns.items()}
+
+
+def explain_pipeline(dsl: Dict[str, Any], dfs: Dict[str, pd.DataFrame],
+                     cache: Optional[StepCache] = STEP_CACHE) -> Dict[str, Any]:
+    """What `run_pipeline` would do with *dsl*, without running it
+    (see `Runner.explain`)."""
+    runner = Runner(steps=dsl["steps"], dfs=dfs, cache=cache)
+    return runner.explain(dsl.get("return", [dsl["steps"][-1]["id"]]))
+
+
+def cache_stats() -> Dict[str, Any]:
+    return STEP_CACHE.stats()
 
 
 def clear_cache():  # tests only
-    _fetch_votes.cache_clear()
+    VOTES.clear()
+    STEP_CACHE.clear()
+    SESSIONS._sessions.clear()
@@ -1,35 +1,99 @@
+import glob
+import os
 import pickle
 import pandas as pd
+from functools import lru_cache
 from typing import Dict, Any
 
-with open("./output/uk_parliament.pkl", "rb") as fh:
-    MEMBER_LOOKUP_DATA: Dict[int, Dict[str, Any]] = pickle.load(fh)
+import text_search
+from dsl import ChunkedTable, categorize
+from table_store import TableRegistry
+
+
+_MEMBER_PKL = "./output/uk_parliament.pkl"
+
+
+@lru_cache(maxsize=1)
+def member_lookup_data() -> Dict[int, Dict[str, Any]]:
+    with open(_MEMBER_PKL, "rb") as fh:
+        return pickle.load(fh)
+
 
 static_cols   = ["member_id","name","gender","current_house",
                  "constituency","currentParty","isCurrentMember",
                  "nContributions"]
-lookup_static = (pd
-    .DataFrame.from_dict(MEMBER_LOOKUP_DATA, orient="index")
-    .reset_index(names="member_id")[static_cols])
-
-# long table for time-varying party affiliation
-rows = []
-for mid, blob in MEMBER_LOOKUP_DATA.items():
-    for aff in blob["partyAffiliations"]:
-        rows.append({
-            "member_id": mid,
-            "party": aff["party"],
-            "start":  aff["startDate"],
-            "end":    aff["endDate"] or "9999-12-31"
-        })
-party_affil = pd.DataFrame(rows)
-
-
-dfs = {
-    'interest_df' : pd.read_csv('./output/all_interest_df.csv'),
-    'written_questions_df' : pd.read_csv('./output/written_questions_2024.csv'),
-    'written_statements_df' : pd.read_csv('./output/written_statements_2024.csv'),
-    'divisions_df' : pd.read_csv('./output/divisions_2024.csv'),
-    "member_lookup": lookup_static,
-    "member_party_history": party_affil,
-}
\ No newline at end of file
+
+
+def _lookup_static() -> pd.DataFrame:
+    return (pd
+        .DataFrame.from_dict(member_lookup_data(), orient="index")
+        .reset_index(names="member_id")[static_cols])
+
+
+def _party_affil() -> pd.DataFrame:
+    # long table for time-varying party affiliation
+    rows = []
+    for mid, blob in member_lookup_data().items():
+        for aff in blob["partyAffiliations"]:
+            rows.append({
+                "member_id": mid,
+                "party": aff["party"],
+                "start":  aff["startDate"],
+                "end":    aff["endDate"] or "9999-12-31"
+            })
+    return pd.DataFrame(rows)
+
+
+# optional trigram indexes for regex/icontains filters (HANSARD_TEXT_INDEX=1)
+TEXT_INDEX_COLUMNS = {
+    "interest_df": ["interest"],
+    "written_questions_df": ["value"],
+    "written_statements_df": ["value"],
+}
+
+
+def _indexed(name):
+    """Per-process step after loading (indexes live in process memory and
+    are keyed by the frame object, so they're built on the final frame)."""
+    def run(df):
+        if os.environ.get("HANSARD_TEXT_INDEX"):
+            for col in TEXT_INDEX_COLUMNS.get(name, []):
+                text_search.build_index(df, col)
+        return df
+    return run
+
+
+# Each table is loaded on first use (typed Parquet copies when
+# `python table_store.py` has been run, else the CSVs), with low-cardinality
+# string columns (party, gender, constituency, ...) as categoricals.
+# HANSARD_WARM_TABLES=1 loads them all in a background thread at import;
+# HANSARD_SHARED_TABLES=<dir> shares them between worker processes.
+dfs = TableRegistry()
+for _name, _stem in [('interest_df', 'all_interest_df'),
+                     ('written_questions_df', 'written_questions_2024'),
+                     ('written_statements_df', 'written_statements_2024'),
+                     ('divisions_df', 'divisions_2024')]:
+    dfs.register_file(_name, _stem, transform=categorize, on_load=_indexed(_name))
+# column dtypes of the pickle-built tables, so /api/schema needn't load them
+# ("str": text, stored as object or categorical depending on cardinality)
+_MEMBER_DTYPES = {
+    "member_lookup": {"member_id": "int64", "name": "str", "gender": "str",
+                      "current_house": "int64", "constituency": "str",
+                      "currentParty": "str", "isCurrentMember": "bool",
+                      "nContributions": "int64"},
+    "member_party_history": {"member_id": "int64", "party": "str",
+                             "start": "str", "end": "str"},
+}
+for _name, _build in [("member_lookup", _lookup_static),
+                      ("member_party_history", _party_affil)]:
+    dfs.register(_name, lambda b=_build: categorize(b()),
+                 dtypes=lambda n=_name: dict(_MEMBER_DTYPES[n]),
+                 version=lambda: os.path.getmtime(_MEMBER_PKL))
+
+# full contributions archive, scanned in chunks rather than loaded
+_archive = sorted(glob.glob("./output/contributions_[0-9]*.csv"))
+if _archive:
+    dfs.register("contributions_archive", lambda: ChunkedTable(_archive))
+
+if os.environ.get("HANSARD_WARM_TABLES"):
+    dfs.warm()
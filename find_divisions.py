@@ -1,3 +1,4 @@
+import os
 import re
 from typing import Dict, Tuple
 
@@ -5,6 +6,9 @@ import numpy as np
 import pandas as pd
 import random
 
+import text_search
+from table_store import TableRegistry
+
 # ---------------------------------------------------------------------------
 # 📁  DATA SOURCES
 # ---------------------------------------------------------------------------
@@ -17,9 +21,20 @@ import random
 #            division_title, ayes, noes, context_url
 # ---------------------------------------------------------------------------
 #con_df_raw = pd.read_csv("./output/contributions_2024.csv")
-div_df = pd.read_csv("./output/divisions_2024.csv")
-con_df = pd.read_csv(
-    "./output/contributions_filtered_2024.csv"
+# typed Parquet copies when `python table_store.py` has been run, else the
+# CSVs; each is loaded on the first request that needs it
+TABLES = TableRegistry()
+TABLES.register_file("div_df", "divisions_2024")
+
+
+def _index_value(df):
+    if os.environ.get("HANSARD_TEXT_INDEX"):
+        text_search.build_index(df, "value")
+    return df
+
+
+TABLES.register_file(
+    "con_df", "contributions_filtered_2024", on_load=_index_value
 )  #con_df_raw.loc[con_df_raw['debate_id'].isin(div_df['debate_id'])]
 
 CONTRIB_COLS = [
@@ -102,6 +117,16 @@ def _eval_node(node: Dict, df: pd.DataFrame) -> pd.Series:
         if pattern is None:
             raise ValueError("Leaf DSL node missing 'pattern'.")
 
+        regex = pattern if op == "regex" else re.escape(pattern)
+        ix = text_search.index_for(df, column)
+        rows = ix.candidates(regex, op == "icontains") if ix is not None else None
+        if rows is not None:  # verify only the rows the trigram index allows
+            mask = np.zeros(len(df), dtype=bool)
+            sub = df[column].iloc[rows].fillna("").astype(str)
+            mask[rows] = sub.str.contains(
+                text_search.compile_pattern(regex, op == "icontains"), na=False)
+            return pd.Series(mask, index=df.index)
+
         series = df[column].fillna("").astype(str)
         if op == "regex":
             return series.str.contains(pattern, regex=True, na=False)
@@ -189,6 +214,8 @@ def find_divisions_from_dsl(dsl: Dict,
         text = text.encode('ascii', 'replace').decode('ascii')
         return text
 
+    con_df, div_df = TABLES["con_df"], TABLES["div_df"]
+
     # 1️⃣  Evaluate the DSL against *con_df*
     mask = get_boolean_series_from_dsl(dsl, con_df)
     filtered = con_df.loc[mask, CONTRIB_COLS]
@@ -279,6 +306,7 @@ def find_division_from_id_and_house(division_id, house):
         filter_house = 'Lords Chamber'
     
     print(f"FIND_DIVISION: Filtering for house='{filter_house}'")
+    div_df = TABLES["div_df"]
     print(f"FIND_DIVISION: Available columns in div_df: {list(div_df.columns)}")
     print(f"FIND_DIVISION: div_df shape: {div_df.shape}")
     
@@ -3,6 +3,7 @@ import StepCard from './StepCard';
 import { deriveSchema } from './utils/DeriveSchema';
 import useSchemaCache from './hooks/useSchemaCache';
 import generateId from './utils/GenerateId';
+import newSessionId from './utils/SessionId';
 import styles from './DSLBuilder.module.css';
 
 export default function DSLBuilder() {
@@ -13,6 +14,8 @@ export default function DSLBuilder() {
   const [tableSchemas, requestSchema] = useSchemaCache();
   const [expandedCard, setExpandedCard] = useState(null);
   const [currentCarouselIndex, setCurrentCarouselIndex] = useState(0);
+  // lets the server reuse step outputs that haven't changed since the last run
+  const [sessionId] = useState(newSessionId);
 
   const addStep = useCallback((op) => {
     const newStep = {
@@ -99,7 +102,7 @@ export default function DSLBuilder() {
       const dsl = { steps, return: [steps[steps.length - 1].id] };
       const response = await fetch('/api/run', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', 'X-Session-Id': sessionId },
         body: JSON.stringify(dsl),
       });
 
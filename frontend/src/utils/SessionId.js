@@ -0,0 +1,15 @@
+// utils/SessionId.js
+// crypto.randomUUID only exists in secure contexts (https / localhost), so
+// plain-http deployments fall back to getRandomValues, then Math.random.
+export default function newSessionId() {
+  const c = typeof crypto !== 'undefined' ? crypto : undefined;
+  if (c && typeof c.randomUUID === 'function') return c.randomUUID();
+  const bytes = new Uint8Array(16);
+  if (c && typeof c.getRandomValues === 'function') {
+    c.getRandomValues(bytes);
+  } else {
+    for (let i = 0; i < bytes.length; i++) bytes[i] = Math.floor(Math.random() * 256);
+  }
+  const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('');
+  return `${Date.now().toString(36)}-${hex}`;
+}
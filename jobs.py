@@ -0,0 +1,200 @@
+"""Background jobs for long pipelines, run in a local process pool.
+
+* `JobQueue.submit` – queues a DSL document and returns a job id at once;
+  raises `QueueFull` when `max_jobs` jobs are already queued or running.
+* `JobQueue.status` – state (queued / running / done / failed / cancelled)
+  plus step‑by‑step progress (``done`` of ``total`` steps, last step id).
+* `JobQueue.result` – the `run_pipeline` output of a finished job.
+
+Workers are ``spawn``‑ed processes (no forked Flask/thread state) that load
+the base tables once (in their initializer, or on first use for a lazy
+`TableRegistry`) and then serve many jobs; each keeps its own step cache.
+Progress and cancellation travel over a `multiprocessing.Manager`
+queue/dict, so nothing but the standard library is needed.  Finished jobs
+are forgotten `ttl` seconds after they end.  If a worker dies (e.g. the OOM
+killer), its jobs fail and the next submit starts a fresh pool.
+"""
+
+import importlib
+import multiprocessing as mp
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from dsl import Budget, CancelToken, Cancelled, PipelineAborted, run_pipeline
+
+_JOB_WORKERS = 2             # worker processes
+_JOB_QUEUE = 16              # max queued + running jobs
+_JOB_TTL = 10 * 60           # seconds a finished job's result is kept
+
+# worker‑process globals, set by `_init_worker`
+_DFS = None; _PROGRESS = None; _CANCELLED = None
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _load(spec: str):
+    """``"module:attr"`` → that attribute (imported in the worker)."""
+    mod, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(mod), attr)
+
+
+def _init_worker(tables: str, progress, cancelled):
+    global _DFS, _PROGRESS, _CANCELLED
+    _DFS, _PROGRESS, _CANCELLED = _load(tables), progress, cancelled
+
+
+def _run_job(job_id: str, dsl: Dict[str, Any], seconds: Optional[float],
+             max_bytes: Optional[int]):
+    """Runs in a worker.  Returns ``("done", out)`` or ``("failed", error
+    dict)``: errors are returned rather than raised, as the budget
+    exceptions don't survive pickling."""
+    if job_id in _CANCELLED:    # cancelled after the pool had dispatched it
+        return "failed", Cancelled(None).to_dict()
+    _PROGRESS.put((job_id, "running", None, 0, None))
+
+    def progress(sid, done, total):
+        _PROGRESS.put((job_id, "running", sid, done, total))
+
+    token = CancelToken(lambda: job_id in _CANCELLED, interval=0.5)
+    try:
+        return "done", run_pipeline(dsl, _DFS, progress=progress,
+                                    budget=Budget(seconds, max_bytes, token))
+    except PipelineAborted as e:
+        return "failed", e.to_dict()
+    except Exception as e:  # surfaced to the client via status()/result()
+        return "failed", {"error": type(e).__name__, "message": str(e)}
+
+
+class JobQueue:
+    """Bounded queue of pipeline jobs over a spawn‑context process pool.
+    Workers start lazily, on the first submit."""
+
+    def __init__(self, tables: str = "dsl_supporter:dfs", workers: int = _JOB_WORKERS,
+                 max_jobs: int = _JOB_QUEUE, ttl: float = _JOB_TTL,
+                 seconds: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.tables, self.workers, self.max_jobs, self.ttl = tables, workers, max_jobs, ttl
+        self.seconds, self.max_bytes = seconds, max_bytes   # per‑job budget
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pool = self._manager = None
+
+    def _start(self):
+        ctx = mp.get_context("spawn")
+        if self._manager is None:    # outlives a broken pool (see `_finish`)
+            self._manager = ctx.Manager()
+            self._progress, self._cancelled = self._manager.Queue(), self._manager.dict()
+            threading.Thread(target=self._listen, name="jobs-progress", daemon=True).start()
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=ctx, initializer=_init_worker,
+                                         initargs=(self.tables, self._progress, self._cancelled))
+
+    def _listen(self):
+        while True:
+            try:
+                msg = self._progress.get()
+            except (EOFError, OSError):   # manager shut down before our None
+                return
+            if msg is None:
+                return
+            job_id, state, sid, done, total = msg
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["state"] not in ("queued", "running"):
+                    continue   # late message for a finished/expired job
+                job["state"] = state
+                job["started"] = job["started"] or time.time()
+                if sid is not None:
+                    job.update(step=sid, done=done, total=total)
+
+    def _expire(self):
+        now = time.time()
+        for jid in [j for j, v in self._jobs.items()
+                    if v["finished"] is not None and now - v["finished"] > self.ttl]:
+            del self._jobs[jid]
+            self._cancelled.pop(jid, None)
+
+    def submit(self, dsl: Dict[str, Any]) -> str:
+        with self._lock:
+            self._expire()
+            active = sum(v["state"] in ("queued", "running") for v in self._jobs.values())
+            if active >= self.max_jobs:
+                raise QueueFull(f"{active} jobs queued or running")
+            if self._pool is None:
+                self._start()
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {"state": "queued", "step": None, "done": 0, "total": None,
+                                  "submitted": time.time(), "started": None,
+                                  "finished": None, "result": None, "error": None}
+            pool = self._pool
+            fut = self._jobs[job_id]["future"] = \
+                pool.submit(_run_job, job_id, dsl, self.seconds, self.max_bytes)
+        fut.add_done_callback(lambda f: self._finish(job_id, f, pool))
+        return job_id
+
+    def _finish(self, job_id: str, fut, pool):
+        try:
+            state, payload = fut.result()
+        except CancelledError:
+            state, payload = "cancelled", {"error": "cancelled", "message": "cancelled while queued"}
+        except Exception as e:   # worker died (e.g. killed by the OOM killer)
+            state, payload = "failed", {"error": type(e).__name__, "message": str(e)}
+            if isinstance(e, BrokenProcessPool):
+                # its workers are already gone; the next submit starts a new
+                # pool (no shutdown() here: this runs on the pool's own thread)
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if state == "failed" and payload.get("error") == "cancelled":
+                state = "cancelled"
+            job.update(state=state, finished=time.time(),
+                       **({"result": payload} if state == "done" else {"error": payload}))
+            if state == "done":
+                job["done"] = job["total"] = job["total"] or job["done"]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Public fields of the job, or None if unknown or expired."""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {"job_id": job_id,
+                    **{k: v for k, v in job.items() if k not in ("result", "future")}}
+
+    def result(self, job_id: str):
+        """``(state, output or error)``; output only once state is "done"."""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None, None
+            return job["state"], job["result"] if job["state"] == "done" else job["error"]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if unknown or finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] not in ("queued", "running"):
+                return False
+            self._cancelled[job_id] = True   # running: seen at the next budget check
+            fut = job["future"]
+        fut.cancel()                         # still queued: never starts
+        return True
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._progress.put(None)
+            self._manager.shutdown()
+            self._manager = None
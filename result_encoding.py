@@ -0,0 +1,170 @@
+"""Response encoding for pipeline results.
+
+* `to_jsonable`   – results → plain JSON values.  DataFrames become a
+  columnar layout ``{"columns": [...], "dtypes": [...], "data": [[...], ...]}``
+  (one list per column, in column order); NaN/±inf become null, NumPy
+  scalars/arrays become Python numbers/lists and timestamps/timedeltas ISO
+  8601 strings.
+* `encode_results` – picks JSON or Arrow IPC from the ``Accept`` header and
+  gzip/brotli from ``Accept-Encoding``; returns ``(body, headers)``.
+
+orjson and brotli are optional (``pip install .[encoding]``); without them
+the stdlib JSON encoder and gzip are used, and JSON responses if pyarrow
+is missing too.
+"""
+
+import datetime
+import gzip
+import json
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+_MIN_COMPRESS = 1024        # bytes; smaller bodies aren't worth compressing
+
+
+def _column(s: pd.Series) -> list:
+    """One column as a JSON‑ready list (missing / non‑finite → None)."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype(s.cat.categories.dtype)
+    if pd.api.types.is_bool_dtype(s.dtype):      # incl. nullable "boolean"
+        if not s.hasnans:
+            return s.to_numpy(bool).tolist()
+        return [None if m else bool(x) for x, m in zip(s.to_numpy(object), s.isna().to_numpy())]
+    if pd.api.types.is_integer_dtype(s.dtype):   # nullable ints stay ints
+        if not s.hasnans:   # uint64 above 2**63 doesn't fit int64
+            return s.to_numpy(np.uint64 if s.dtype.kind == "u" else np.int64).tolist()
+        return [None if m else int(x) for x, m in zip(s.to_numpy(object), s.isna().to_numpy())]
+    if pd.api.types.is_timedelta64_dtype(s.dtype):   # ISO 8601 durations
+        return [None if m else x.isoformat() for x, m in zip(s, s.isna().to_numpy())]
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        a = s.to_numpy(np.float64, na_value=np.nan)
+        out = a.astype(object)
+        out[~np.isfinite(a)] = None
+        return out.tolist()
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        out = s.dt.strftime("%Y-%m-%dT%H:%M:%S").astype(object)
+        return out.where(s.notna(), None).tolist()
+    out = s.to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(out, skipna=True) in ("string", "empty"):
+        # np.where, not assignment: the array may be a read-only view
+        return np.where(s.isna().to_numpy(), None, out).tolist()
+    return [None if _missing(x) else _scalar(x) for x in out]
+
+
+def _missing(x) -> bool:
+    return x is None or x is pd.NA or x is pd.NaT or (isinstance(x, float) and math.isnan(x))
+
+
+def _scalar(x):
+    if isinstance(x, np.generic):
+        x = x.item()
+    if isinstance(x, float) and not math.isfinite(x):
+        return None
+    if isinstance(x, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(x).isoformat()
+    if isinstance(x, datetime.timedelta):   # incl. pd.Timedelta
+        return pd.Timedelta(x).isoformat()
+    return x
+
+
+def _keeps_index(df: pd.DataFrame) -> bool:
+    """True if *df*'s index is data (named, or a MultiIndex) rather than the
+    row labels a filter or sort left behind."""
+    return isinstance(df.index, pd.MultiIndex) or df.index.name is not None
+
+
+def frame_to_columnar(df: pd.DataFrame) -> Dict[str, Any]:
+    if _keeps_index(df):
+        df = df.reset_index()
+    elif not isinstance(df.index, pd.RangeIndex):
+        df = df.reset_index(drop=True)
+    return {"columns": [str(c) for c in df.columns],
+            "dtypes": [str(t) for t in df.dtypes],
+            "data": [_column(df.iloc[:, i]) for i in range(df.shape[1])]}
+
+
+def to_jsonable(obj):
+    """*obj* with every DataFrame/Series/NumPy value turned into plain JSON."""
+    if isinstance(obj, pd.DataFrame):
+        return frame_to_columnar(obj)
+    if isinstance(obj, pd.Series):
+        return frame_to_columnar(obj.to_frame())
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return to_jsonable(obj.tolist())
+    return None if _missing(obj) else _scalar(obj)
+
+
+def dumps(obj) -> bytes:
+    data = to_jsonable(obj)
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), allow_nan=False).encode()
+
+
+def to_arrow(df: pd.DataFrame, name: Optional[str] = None) -> bytes:
+    """*df* as one Arrow IPC stream (schema metadata ``name`` = result id)."""
+    table = pa.Table.from_pandas(df, preserve_index=_keeps_index(df))
+    if name is not None:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"name": name.encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _accepts(header: Optional[str], token: str) -> bool:
+    """*token* listed in an Accept/Accept‑Encoding header with q > 0."""
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == token:
+            q = params.strip()
+            try:
+                return not (q.startswith("q=") and float(q[2:]) == 0)
+            except ValueError:
+                return False
+    return False
+
+
+def encode_results(out: Dict[str, Any], accept: Optional[str] = None,
+                   accept_encoding: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """Body and headers for a `run_pipeline` result.  Arrow IPC is used when
+    *accept* asks for it, pyarrow is installed and the result is a single
+    DataFrame (an IPC stream has one schema); otherwise columnar JSON."""
+    frames = {k: v for k, v in out.items() if isinstance(v, pd.DataFrame)}
+    body = None
+    if pa is not None and _accepts(accept, ARROW_STREAM) and len(out) == len(frames) == 1:
+        (name, df), = frames.items()
+        try:
+            body, headers = to_arrow(df, name), {"Content-Type": ARROW_STREAM}
+        except (pa.ArrowInvalid, pa.ArrowTypeError):  # e.g. mixed‑type object column
+            body = None
+    if body is None:
+        body, headers = dumps(out), {"Content-Type": "application/json"}
+    headers["Vary"] = "Accept, Accept-Encoding"
+    if len(body) >= _MIN_COMPRESS:
+        if brotli is not None and _accepts(accept_encoding, "br"):
+            body, headers["Content-Encoding"] = brotli.compress(body, quality=4), "br"
+        elif _accepts(accept_encoding, "gzip"):
+            body, headers["Content-Encoding"] = gzip.compress(body, compresslevel=5), "gzip"
+    return body, headers
@@ -0,0 +1,320 @@
+"""Typed columnar copies of the ingest outputs.
+
+* `SCHEMAS`    – the dtype of every known column of each ingest CSV.
+* `convert`    – CSV → Parquet (or Feather) with those dtypes; categoricals
+  are stored dictionary‑encoded, so they load back as categoricals.
+* `load_table` – reads the columnar copy when it is at least as new as the
+  CSV, otherwise the CSV with the same explicit dtypes (no type
+  inference, no object columns).
+* `TableRegistry` – a read‑only mapping of table name → frame that loads
+  each table on first access (e.g. the `dfs` handed to the DSL), records
+  load time and size, can warm tables in a background thread, and answers
+  `dtypes` from file metadata without loading.
+* Shared tables – with a `shared_dir` (``HANSARD_SHARED_TABLES``, ideally
+  on tmpfs such as ``/dev/shm/hansard``) the registry `publish`es each
+  loaded frame once as an uncompressed Arrow IPC file and every process
+  `map_frame`s it: numeric, datetime, string and categorical columns are
+  zero‑copy, read‑only views of the same page‑cache pages, so N server
+  workers hold one copy of the data.  Bit‑packed booleans and nullable
+  ints with nulls are still converted per process.
+
+Run ``python table_store.py`` after an ingest to (re)write the
+``./output/*.parquet`` files.  pyarrow is a declared dependency; in an
+environment without it `load_table` keeps reading the CSVs, still with
+explicit dtypes.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Parquet/Feather engine)
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+OUTPUT_DIR = "./output"
+SHARED_DIR = os.environ.get("HANSARD_SHARED_TABLES")   # None: tables are private
+_FORMATS = {"parquet": (pd.read_parquet, "to_parquet"),
+            "feather": (pd.read_feather, "to_feather")}
+
+# dtype names: pandas dtypes, plus "datetime" (parsed, unparseable → NaT).
+# Columns a CSV has beyond these are read with inference, as before.
+_CONTRIBUTION = {
+    "debate_id": "str", "value": "str", "n_char": "Int64", "n_words_guess": "Int64",
+    "MemberId": "Int64", "speaker": "Int64", "is_chair": "boolean",
+    "context_url": "str", "name": "str", "gender": "category", "party": "category",
+    "age_proxy": "float64", "constituency": "category", "location": "category",
+    "debate_title": "str", "title_slug": "str", "debate_date": "datetime",
+    "ItemId": "Int64", "ExternalId": "str", "OrderInSection": "Int64",
+    "latest_timecode": "datetime",
+}
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    "all_interest_df": {
+        "id": "Int64", "parent": "Int64", "ancestors": "str", "descendants": "str",
+        "category": "category", "interest": "str", "createdWhen": "datetime",
+        "lastAmendedWhen": "datetime", "deletedWhen": "datetime",
+        "isCorrection": "boolean", "m_id": "Int64",
+    },
+    "divisions_2024": {
+        # division_date_time stays ISO text: /api/division_by_id returns it as is
+        "division_number": "str", "division_id": "int64", "date": "datetime",
+        "division_date_time": "str", "ayes": "Int64", "noes": "Int64",
+        "context_url": "str", "division_title": "str", "debate_id": "str",
+        "location": "category", "debate_title": "str", "title_slug": "str",
+        "debate_date": "datetime", "ItemId": "Int64", "ExternalId": "str",
+        "OrderInSection": "Int64", "latest_timecode": "datetime",
+    },
+    "contributions_2024": _CONTRIBUTION,
+    "contributions_filtered_2024": _CONTRIBUTION,
+    "written_questions_2024": {"value": "str"},
+    "written_statements_2024": {"value": "str"},
+}
+
+
+# applied after parsing: the C parser is several times slower reading straight
+# into nullable ints/booleans than casting its int/float/bool columns afterwards
+_CAST_AFTER = {"Int64", "boolean", "datetime"}
+
+
+def read_csv_typed(path: str, schema: Dict[str, str], nrows: Optional[int] = None) -> pd.DataFrame:
+    """*path* with the columns in *schema* read as the given dtypes."""
+    header = list(pd.read_csv(path, nrows=0).columns)
+    df = pd.read_csv(path, nrows=nrows, dtype={c: t for c, t in schema.items()
+                                               if c in header and t not in _CAST_AFTER})
+    for c, t in schema.items():
+        if c not in df or t not in _CAST_AFTER:
+            continue
+        if t == "datetime":   # mixed ISO formats; unparseable → NaT
+            df[c] = pd.to_datetime(df[c], errors="coerce", format="ISO8601")
+        else:
+            df[c] = df[c].astype(t)
+    return df
+
+
+def _columnar_path(name: str, directory: str) -> Optional[str]:
+    for fmt in _FORMATS:
+        path = os.path.join(directory, f"{name}.{fmt}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def convert(name: str, directory: str = OUTPUT_DIR, fmt: str = "parquet") -> str:
+    """Write ``<directory>/<name>.csv`` as ``<name>.<fmt>`` with its schema;
+    returns the new path.  Written to a temp file first, so a reader never
+    sees a half‑written table."""
+    if pyarrow is None:
+        raise RuntimeError("convert needs pyarrow")
+    df = read_csv_typed(os.path.join(directory, f"{name}.csv"), SCHEMAS.get(name, {}))
+    out = os.path.join(directory, f"{name}.{fmt}")
+    getattr(df, _FORMATS[fmt][1])(out + ".tmp")
+    os.replace(out + ".tmp", out)
+    for other in _FORMATS:   # one columnar copy per table
+        stale = os.path.join(directory, f"{name}.{other}")
+        if other != fmt and os.path.exists(stale):
+            os.remove(stale)
+    return out
+
+
+def load_table(name: str, directory: str = OUTPUT_DIR, columns=None) -> pd.DataFrame:
+    """Table *name* (an ingest file stem, e.g. ``"divisions_2024"``): the
+    columnar copy if pyarrow is available and it isn't older than the CSV,
+    else the CSV read with the explicit schema."""
+    csv = os.path.join(directory, f"{name}.csv")
+    path = _columnar_path(name, directory) if pyarrow is not None else None
+    if path is not None and (not os.path.exists(csv)
+                             or os.path.getmtime(path) >= os.path.getmtime(csv)):
+        df = _FORMATS[path.rsplit(".", 1)[1]][0](path, columns=columns)
+        pyarrow.default_memory_pool().release_unused()   # Arrow‑side read buffers
+        return df
+    df = read_csv_typed(csv, SCHEMAS.get(name, {}))
+    return df if columns is None else df[columns]
+
+
+def publish(df: pd.DataFrame, path: str) -> None:
+    """Write *df* as an uncompressed, single‑chunk Arrow IPC file (mappable
+    zero‑copy).  Each writer uses its own temp file and renames it into
+    place, so concurrent publishers and readers never see a partial file."""
+    table = pyarrow.Table.from_pandas(df).combine_chunks()
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pyarrow.OSFile(tmp, "wb") as fh, pyarrow.ipc.new_file(fh, table.schema) as w:
+        w.write_table(table)
+    os.replace(tmp, path)
+
+
+def map_frame(path: str) -> pd.DataFrame:
+    """A DataFrame over the memory‑mapped Arrow file *path*.  Columns that
+    can be are read‑only views of the mapping (`split_blocks` keeps them
+    from being consolidated into fresh 2‑D blocks); the mapping lives as
+    long as any of them does.  Strings become pandas' Arrow‑backed ``str``
+    dtype (the default from pandas 3 on; pandas 2 would copy them into
+    Python objects)."""
+    table = pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
+    text = pd.StringDtype("pyarrow", na_value=np.nan)
+    return table.to_pandas(split_blocks=True, types_mapper={
+        pyarrow.string(): text, pyarrow.large_string(): text}.get)
+
+
+def table_dtypes(name: str, directory: str = OUTPUT_DIR) -> Dict[str, str]:
+    """``{column: dtype}`` of what `load_table` would return, from the
+    columnar file's schema or the CSV header + `SCHEMAS` (sampling the
+    first rows for columns without a schema entry); no full read."""
+    path = _columnar_path(name, directory) if pyarrow is not None else None
+    csv = os.path.join(directory, f"{name}.csv")
+    if path is not None and (not os.path.exists(csv)
+                             or os.path.getmtime(path) >= os.path.getmtime(csv)):
+        if path.endswith(".parquet"):
+            schema = pyarrow.parquet.read_schema(path)
+        else:
+            with pyarrow.ipc.open_file(path) as rd:
+                schema = rd.schema
+        empty = schema.empty_table().to_pandas()
+    else:
+        schema = SCHEMAS.get(name, {})
+        empty = read_csv_typed(csv, schema, nrows=1000).iloc[:0]
+    return {c: str(t) for c, t in empty.dtypes.items()}
+
+
+class TableRegistry(Mapping):
+    """Tables by name, each loaded by its loader on first access and then
+    kept.  Iterating, ``len`` and ``in`` never load anything.
+
+    A loader returns the table (a DataFrame, or anything the DSL accepts as
+    one, e.g. a `ChunkedTable`); *dtypes* optionally answers `dtypes`
+    without loading.  Loads of one table are serialised; different tables
+    load concurrently.
+
+    With *shared_dir*, DataFrames are published there and mapped (see
+    `map_frame`); a published file is reused by every process until it is
+    older than *version()* (the source's mtime).  *on_load* then runs in
+    each process on the mapped frame (e.g. to build in‑memory indexes)."""
+
+    def __init__(self, shared_dir: Optional[str] = SHARED_DIR):
+        self.shared_dir = shared_dir if pyarrow is not None else None
+        if self.shared_dir is not None:
+            os.makedirs(self.shared_dir, exist_ok=True)
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._dtypes: Dict[str, Callable[[], Dict[str, str]]] = {}
+        self._versions: Dict[str, Callable[[], float]] = {}
+        self._on_load: Dict[str, Callable[[Any], Any]] = {}
+        self._tables: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, loader: Callable[[], Any],
+                 dtypes: Optional[Callable[[], Dict[str, str]]] = None,
+                 version: Optional[Callable[[], float]] = None,
+                 on_load: Optional[Callable[[Any], Any]] = None) -> None:
+        self._loaders[name], self._locks[name] = loader, threading.Lock()
+        for reg, fn in ((self._dtypes, dtypes), (self._versions, version),
+                        (self._on_load, on_load)):
+            if fn is not None:
+                reg[name] = fn
+
+    def register_file(self, name: str, stem: str, directory: str = OUTPUT_DIR,
+                      transform: Optional[Callable[[Any], Any]] = None,
+                      on_load: Optional[Callable[[Any], Any]] = None) -> None:
+        """Register ingest output *stem* (via `load_table`) as *name*;
+        *transform* runs before the frame is shared, *on_load* after."""
+        load = lambda: load_table(stem, directory)
+
+        def version():
+            paths = [os.path.join(directory, f"{stem}.{ext}") for ext in ("csv", *_FORMATS)]
+            return max(os.path.getmtime(p) for p in paths if os.path.exists(p))
+
+        self.register(name, (lambda: transform(load())) if transform else load,
+                      lambda: table_dtypes(stem, directory), version, on_load)
+
+    def _load(self, name: str):
+        """(table, shared?) for *name*, published and mapped when sharing."""
+        if self.shared_dir is None:
+            return self._loaders[name](), False
+        path = os.path.join(self.shared_dir, f"{name}.arrow")
+        version = self._versions.get(name)
+        if not (os.path.exists(path)
+                and (version is None or os.path.getmtime(path) >= version())):
+            table = self._loaders[name]()
+            if not isinstance(table, pd.DataFrame):
+                return table, False     # e.g. a ChunkedTable: already out of core
+            try:
+                publish(table, path)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                return table, False     # e.g. mixed‑type object column: keep private
+        return map_frame(path), True
+
+    def __getitem__(self, name: str):
+        try:
+            return self._tables[name]
+        except KeyError:
+            if name not in self._loaders:
+                raise
+        with self._locks[name]:
+            if name not in self._tables:     # another thread may have loaded it
+                t0 = time.perf_counter()
+                table, shared = self._load(name)
+                if name in self._on_load:
+                    table = self._on_load[name](table)
+                self._stats[name] = {"load_s": round(time.perf_counter() - t0, 3),
+                                     "shared": shared, **_size(table)}
+                self._tables[name] = table
+        return self._tables[name]
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self) -> int:
+        return len(self._loaders)
+
+    def __contains__(self, name) -> bool:
+        return name in self._loaders
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._tables
+
+    def dtypes(self, name: str) -> Dict[str, str]:
+        """``{column: dtype}`` of *name*: from the loaded table if there is
+        one, else from metadata, else (no metadata source) by loading it."""
+        table = self._tables.get(name)
+        if table is None and name in self._dtypes:
+            return self._dtypes[name]()
+        if table is None:
+            table = self[name]
+        sample = table if isinstance(table, pd.DataFrame) else table.head(1000)
+        return {c: str(t) for c, t in sample.dtypes.items()}
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per table: whether it is loaded and, if so, load time, rows, bytes
+        and whether it is a shared mapping (bytes then count mapped pages
+        held once for all processes)."""
+        return {n: {"loaded": n in self._tables, **self._stats.get(n, {})}
+                for n in self._loaders}
+
+    def warm(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Load *names* (default: all) one after another in a daemon thread;
+        requests for a table being warmed wait for that load."""
+        names = list(self._loaders if names is None else names)
+        th = threading.Thread(target=lambda: [self[n] for n in names],
+                              name="tables-warm", daemon=True)
+        th.start()
+        return th
+
+
+def _size(table) -> Dict[str, Any]:
+    if isinstance(table, pd.DataFrame):
+        return {"rows": len(table), "bytes": int(table.memory_usage(deep=True).sum())}
+    return {"rows": None, "bytes": None}   # out‑of‑core (e.g. ChunkedTable)
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or [n for n in SCHEMAS
+                             if os.path.exists(os.path.join(OUTPUT_DIR, f"{n}.csv"))]
+    for n in names:
+        print(f"{n}: wrote {convert(n)}")
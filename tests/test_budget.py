@@ -0,0 +1,106 @@
+"""Budgets stop runs (time, memory, cancellation) with the step that was
+executing, including inside long single ops; what's already resident is
+not charged."""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dsl
+from dsl import Budget, BudgetExceeded, CancelToken, Cancelled, StepCache, run_pipeline
+
+
+def _tables(n=200_000):
+    rng = np.random.default_rng(0)
+    return {"t": pd.DataFrame({"k": np.arange(n) % 1000, "v": rng.random(n),
+                               "g": rng.choice(["a", "b"], n)})}
+
+
+DOC = {"steps": [
+    {"id": "s", "op": "source", "table": "t"},
+    {"id": "f", "op": "filter", "input": "s", "conditions": [{"lhs": "v", "op": ">", "rhs": 0.1}]},
+    {"id": "j", "op": "join", "inputs": ["f", "f", "f"], "on": ["k"], "how": "inner"},
+    {"id": "a", "op": "aggregate", "input": "f", "group": ["k"],
+     "metrics": {"s": {"fn": "sum", "col": "v"}}},
+]}
+
+
+def test_ample_budget_changes_nothing():
+    doc = {**DOC, "return": ["a"]}
+    want = run_pipeline(doc, _tables(), cache=None)["a"]
+    got = run_pipeline(doc, _tables(), cache=None, budget=Budget(60, 1 << 30))["a"]
+    pd.testing.assert_frame_equal(got, want)
+
+
+def test_fan_out_join_refused_before_it_runs():
+    t0 = time.perf_counter()
+    with pytest.raises(BudgetExceeded) as e:
+        run_pipeline({**DOC, "return": ["j"]}, _tables(), cache=None,
+                     budget=Budget(max_bytes=200_000_000))
+    assert e.value.reason == "memory_budget_exceeded" and e.value.step == "j"
+    assert e.value.used > e.value.limit
+    assert time.perf_counter() - t0 < 5
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_time_budget(streaming):
+    with pytest.raises(BudgetExceeded) as e:
+        run_pipeline({**DOC, "return": ["a"]}, _tables(), cache=None, streaming=streaming,
+                     budget=Budget(seconds=0.0))
+    assert e.value.to_dict()["error"] == "time_budget_exceeded"
+
+
+def test_cancel_token():
+    polls = []
+    token = CancelToken(lambda: polls.append(1) or len(polls) > 1, interval=0)
+    with pytest.raises(Cancelled) as e:
+        run_pipeline({**DOC, "return": ["a"]}, _tables(), cache=None, streaming=True,
+                     budget=Budget(cancel=token))
+    assert e.value.to_dict()["error"] == "cancelled"
+
+
+def test_filter_mask_checked_per_slice(monkeypatch):
+    monkeypatch.setattr(dsl, "_CHUNK_ROWS", 1000)
+    token = CancelToken()
+    calls = []
+
+    def check():
+        calls.append(1)
+        if len(calls) == 3:
+            token.cancel()
+        if token.cancelled:
+            raise Cancelled("f")
+
+    df = _tables()["t"]
+    with pytest.raises(Cancelled):
+        dsl._filter_mask([{"lhs": "g", "op": "regex", "rhs": "a+"}], df, check)
+    assert len(calls) == 3          # stopped mid-scan, not after 200 slices
+
+
+def test_stat_test_cancelled_mid_step():
+    df = pd.DataFrame({"g": ["a", "b"] * 500, "v": np.arange(1000.0)})
+    doc = {"steps": [{"id": "s", "op": "source", "table": "t"},
+                     {"id": "p", "op": "stat_test", "input": "s", "test": "permutation",
+                      "group_col": "g", "value_col": "v", "n_resamples": 10 ** 9}]}
+    polls = []
+    token = CancelToken(lambda: polls.append(1) or len(polls) > 20, interval=0)
+    started = time.perf_counter()
+    with pytest.raises(Cancelled) as e:
+        run_pipeline(doc, {"t": df}, cache=None, budget=Budget(cancel=token))
+    assert e.value.step == "p"
+    assert time.perf_counter() - started < 10
+
+
+def test_resident_outputs_not_charged():
+    tables = _tables(1_000_000)                 # ~24 MB
+    small = Budget(max_bytes=1 << 20)
+    run_pipeline({"steps": [{"id": "s", "op": "source", "table": "t"}]}, tables,
+                 cache=None, budget=small)       # shallow copy of a base table
+    cache = StepCache()
+    doc = {"steps": DOC["steps"][:2], "return": ["f"]}
+    run_pipeline(doc, tables, cache=cache)
+    run_pipeline(doc, tables, cache=cache, budget=Budget(max_bytes=1 << 20))   # cache hit
+    with pytest.raises(BudgetExceeded):
+        run_pipeline(doc, tables, cache=None, budget=Budget(max_bytes=1 << 20))
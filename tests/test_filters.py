@@ -0,0 +1,39 @@
+"""Filters over the nullable columns the typed loader produces (Int64,
+boolean, Arrow strings): missing values fail a test instead of raising."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dsl import run_pipeline
+
+
+def _tables():
+    return {"interest_df": pd.DataFrame({
+        "id": pd.array(range(6), dtype="Int64"),
+        "parent": pd.array([None, 3, 7, None, 9, 5], dtype="Int64"),
+        "isCorrection": pd.array([True, None, False, True, None, False], dtype="boolean"),
+        "interest": pd.array(["rent", None, "shares", "Rental", "gift", None],
+                             dtype=pd.StringDtype("pyarrow", na_value=np.nan)),
+    })}
+
+
+def _ids(conditions):
+    out = run_pipeline({"steps": [
+        {"id": "s", "op": "source", "table": "interest_df"},
+        {"id": "f", "op": "filter", "input": "s", "conditions": conditions},
+    ]}, _tables())
+    return out["f"]["id"].tolist()
+
+
+@pytest.mark.parametrize("conditions, want", [
+    ([{"lhs": "parent", "op": ">", "rhs": 5}], [2, 4]),
+    ([{"lhs": "parent", "op": "!=", "rhs": 7}], [0, 1, 3, 4, 5]),   # as NaN != 7
+    ([{"lhs": "isCorrection", "op": "=", "rhs": True}], [0, 3]),
+    ([{"lhs": "interest", "op": "icontains", "rhs": "rent"}], [0, 3]),
+    ({"op": "or", "args": [{"lhs": "parent", "op": ">", "rhs": 5},
+                           {"lhs": "isCorrection", "op": "=", "rhs": True}]}, [0, 2, 3, 4]),
+    ({"op": "not", "args": [{"lhs": "parent", "op": "<", "rhs": 6}]}, [0, 2, 3, 4]),
+])
+def test_nullable_columns(conditions, want):
+    assert _ids(conditions) == want
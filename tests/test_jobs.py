@@ -0,0 +1,67 @@
+"""JobQueue with real spawned workers: a running job stops soon after
+`cancel`, and a pool broken by a dead worker is replaced."""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from jobs import JobQueue
+
+
+class _Crash:
+    def __getattr__(self, name):   # a source step reading it kills the
+        os._exit(1)                # worker, as the OOM killer would
+
+
+rng = np.random.default_rng(0)
+TABLES = {"votes": pd.DataFrame({"g": rng.choice(["a", "b"], 1000), "v": rng.normal(size=1000)}),
+          "crash": _Crash()}
+
+PERMUTATION = {"steps": [
+    {"id": "s", "op": "source", "table": "votes"},
+    {"id": "t", "op": "stat_test", "input": "s", "test": "permutation",
+     "group_col": "g", "value_col": "v", "n_resamples": 10 ** 9, "seed": 0},
+]}
+COUNT = {"steps": [
+    {"id": "s", "op": "source", "table": "votes"},
+    {"id": "a", "op": "aggregate", "input": "s", "group": ["g"],
+     "metrics": {"n": {"fn": "count", "col": "v"}}},
+]}
+
+
+@pytest.fixture
+def queue():
+    q = JobQueue(tables="test_jobs:TABLES", workers=1)
+    yield q
+    q.shutdown()
+
+
+def _wait(q, job_id, states, timeout=60):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        st = q.status(job_id)
+        if st["state"] in states:
+            return st
+        time.sleep(0.05)
+    raise AssertionError(f"job still {st['state']}")
+
+
+def test_cancel_stops_a_running_stat_test(queue):
+    job = queue.submit(PERMUTATION)
+    _wait(queue, job, {"running"})
+    assert queue.cancel(job)
+    t0 = time.monotonic()
+    assert _wait(queue, job, {"cancelled", "failed", "done"}, timeout=10)["state"] == "cancelled"
+    assert time.monotonic() - t0 < 5
+
+
+def test_broken_pool_is_replaced(queue):
+    dead = queue.submit({"steps": [{"id": "s", "op": "source", "table": "crash"}]})
+    _wait(queue, dead, {"failed"})
+    assert queue.result(dead)[1]["error"] == "BrokenProcessPool"
+    job = queue.submit(COUNT)
+    assert _wait(queue, job, {"done", "failed"})["state"] == "done"
+    assert queue.result(job)[1]["a"]["n"].sum() == 1000
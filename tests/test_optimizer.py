@@ -0,0 +1,94 @@
+"""Each plan rewrite must leave results unchanged: run the same pipeline
+with and without `optimize_plan` (and the reordered join against a plain
+pairwise merge chain) and compare."""
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from dsl import Runner, _ordered_inner_join
+
+
+def _tables(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    contrib = pd.DataFrame({
+        "member_id": rng.integers(0, 200, n),
+        "gender": rng.choice(["F", "M"], n),
+        "party": rng.choice(["Lab", "Con", "LD", "SNP"], n),
+        "text": rng.choice(["israel and gaza", "rental income", "budget", "Israel"], n),
+        "x": rng.normal(size=n),
+        "unused": rng.integers(0, 9, n),
+    })
+    members = pd.DataFrame({
+        "member_id": np.arange(200),
+        "constituency": [f"c{i % 50}" for i in range(200)],
+        "unused2": 0,
+    })
+    return {"contrib": contrib, "members": members}
+
+
+def _run(steps, ret, optimize):
+    r = Runner(steps=steps, dfs=_tables(), optimize=optimize, max_workers=1)
+    return r.run(ret), r.plan
+
+
+def _same(steps, ret, rule):
+    got, plan = _run(steps, ret, optimize=True)
+    want, _ = _run(steps, ret, optimize=False)
+    assert rule in {w["rule"] for w in plan.rewrites}
+    for k in ret:
+        if isinstance(want[k], pd.DataFrame):
+            pdt.assert_frame_equal(got[k].reset_index(drop=True), want[k].reset_index(drop=True))
+        else:
+            assert got[k] == want[k]
+
+
+def test_push_filter():
+    steps = [
+        {"id": "s", "op": "source", "table": "contrib"},
+        {"id": "f", "op": "filter", "input": "s",
+         "conditions": [{"lhs": "text", "op": "icontains", "rhs": "israel"},
+                        {"lhs": "x", "op": ">", "rhs": 0}]},
+        {"id": "a", "op": "aggregate", "input": "f", "group": ["party"],
+         "metrics": {"n": {"fn": "count", "col": "x"}, "m": {"fn": "mean", "col": "x"}}},
+    ]
+    _same(steps, ["f", "a"], "push_filter")
+
+
+def test_fuse_filters():
+    steps = [
+        {"id": "s", "op": "source", "table": "contrib"},
+        {"id": "f1", "op": "filter", "input": "s",
+         "conditions": [{"lhs": "gender", "op": "=", "rhs": "F"}]},
+        {"id": "f2", "op": "filter", "input": "f1",
+         "conditions": [{"lhs": "x", "op": "<", "rhs": 0.5}]},
+    ]
+    _same(steps, ["f2"], "fuse_filters")
+
+
+def test_project():
+    steps = [
+        {"id": "s", "op": "source", "table": "contrib"},
+        {"id": "m", "op": "mutate", "input": "s",
+         "cols": {"y": {"op": "mul", "args": [{"var": "x"}, {"const": 2}]}}},
+        {"id": "j", "op": "join", "inputs": ["m", "mem"], "on": ["member_id"], "how": "left"},
+        {"id": "mem", "op": "source", "table": "members"},
+        {"id": "a", "op": "aggregate", "input": "j", "group": ["constituency"],
+         "metrics": {"y": {"fn": "sum", "col": "y"}}},
+    ]
+    got, plan = _run(steps, ["a"], optimize=True)
+    projected = {w["step"]: w["columns"] for w in plan.rewrites if w["rule"] == "project"}
+    assert "unused" not in projected["s"] and "unused2" not in projected["mem"]
+    _same(steps, ["a"], "project")
+
+
+@pytest.mark.parametrize("sizes", [(50, 400, 30), (400, 30, 50), (30, 50, 400)])
+def test_join_reorder_matches_pairwise_chain(sizes):
+    rng = np.random.default_rng(1)
+    frames = [pd.DataFrame({"k": rng.integers(0, 20, n), f"v{i}": rng.normal(size=n)})
+              for i, n in enumerate(sizes)]
+    want = frames[0]
+    for df in frames[1:]:
+        want = want.merge(df, on=["k"], how="inner")
+    pdt.assert_frame_equal(_ordered_inner_join(frames, ["k"]), want.reset_index(drop=True))
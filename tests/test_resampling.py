@@ -0,0 +1,79 @@
+"""permutation / bootstrap stat tests: p‑values against exact enumeration,
+bootstrap CIs against the normal approximation, seeds, batching."""
+
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dsl
+from dsl import bootstrap_test, permutation_test
+
+
+def _groups():
+    return pd.DataFrame({"g": ["a"] * 5 + ["b"] * 5,
+                         "v": [1.2, 3.4, 2.2, 5.1, 4.0, 0.3, 1.1, 2.0, 0.7, 1.9]})
+
+
+def _exact_p(df, alternative):
+    v, n1 = df["v"].to_numpy(), 5
+    observed = v[:n1].mean() - v[n1:].mean()
+    diffs = []
+    for idx in combinations(range(len(v)), n1):
+        mask = np.zeros(len(v), bool); mask[list(idx)] = True
+        diffs.append(v[mask].mean() - v[~mask].mean())
+    diffs = np.array(diffs)
+    eps = 1e-12
+    if alternative == "greater":
+        return (diffs >= observed - eps).mean()
+    if alternative == "less":
+        return (diffs <= observed + eps).mean()
+    return (np.abs(diffs) >= abs(observed) - eps).mean()
+
+
+@pytest.mark.parametrize("alternative", ["two-sided", "greater", "less"])
+def test_permutation_p_matches_exact(alternative, monkeypatch):
+    monkeypatch.setattr(dsl, "_RESAMPLE_CELLS", 10 * 997)   # many small batches
+    df = _groups()
+    got = permutation_test(df, {"test": "permutation", "group_col": "g", "value_col": "v",
+                                "alternative": alternative, "n_resamples": 20_000, "seed": 1})
+    assert got["statistic"] == pytest.approx(1.98)
+    assert (got["n1"], got["n2"]) == (5, 5)
+    assert got["p"] == pytest.approx(_exact_p(df, alternative), abs=0.01)
+
+
+def test_permutation_pearson():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=200)
+    df = pd.DataFrame({"x": x, "y": x + rng.normal(size=200)})
+    got = permutation_test(df, {"test": "permutation", "x": "x", "y": "y", "seed": 0})
+    assert got["statistic"] == pytest.approx(np.corrcoef(df["x"], df["y"])[0, 1])
+    assert got["p"] == pytest.approx(1 / 10_001)          # nothing as extreme
+    null = permutation_test(df.assign(y=rng.normal(size=200)),
+                            {"test": "permutation", "x": "x", "y": "y", "seed": 0})
+    assert null["p"] > 0.01
+
+
+def test_seed_repeatable():
+    spec = {"test": "bootstrap", "group_col": "g", "value_col": "v", "seed": 7}
+    assert bootstrap_test(_groups(), spec) == bootstrap_test(_groups(), spec)
+    assert bootstrap_test(_groups(), spec) != bootstrap_test(_groups(), {**spec, "seed": 8})
+
+
+def test_bootstrap_mean_ci():
+    rng = np.random.default_rng(3)
+    v = rng.normal(10, 2, 400)
+    got = bootstrap_test(pd.DataFrame({"v": v}), {"test": "bootstrap", "value_col": "v",
+                                                  "n_resamples": 20_000, "seed": 0})
+    se = v.std(ddof=0) / np.sqrt(len(v))
+    assert got["estimate"] == pytest.approx(v.mean())
+    assert got["se"] == pytest.approx(se, rel=0.05)
+    assert got["ci_low"] == pytest.approx(v.mean() - 1.96 * se, abs=0.1 * se)
+    assert got["ci_high"] == pytest.approx(v.mean() + 1.96 * se, abs=0.1 * se)
+
+
+def test_needs_two_groups():
+    df = pd.DataFrame({"g": list("abc") * 3, "v": range(9)})
+    with pytest.raises(ValueError, match="exactly 2 groups"):
+        permutation_test(df, {"test": "permutation", "group_col": "g", "value_col": "v"})
@@ -0,0 +1,25 @@
+"""Row labels left by a filter or sort are not part of a result; a named
+index or MultiIndex is."""
+
+import pandas as pd
+import pyarrow as pa
+
+from result_encoding import frame_to_columnar, to_arrow
+
+
+def _arrow_columns(df):
+    return pa.ipc.open_stream(to_arrow(df)).read_all().column_names
+
+
+def test_leftover_row_labels_dropped():
+    df = pd.DataFrame({"a": [3, 1, 2]}).sort_values("a")
+    assert frame_to_columnar(df) == {"columns": ["a"], "dtypes": ["int64"], "data": [[1, 2, 3]]}
+    assert _arrow_columns(df) == ["a"]
+    assert _arrow_columns(df[df["a"] > 1]) == ["a"]
+
+
+def test_named_index_kept():
+    df = pd.DataFrame({"a": [3, 1]}, index=pd.Index([7, 9], name="k"))
+    assert frame_to_columnar(df)["columns"] == ["k", "a"]
+    assert sorted(_arrow_columns(df)) == ["a", "k"]
+    assert frame_to_columnar(df.set_index("a", append=True).assign(z=0))["columns"] == ["k", "a", "z"]
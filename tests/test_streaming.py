@@ -0,0 +1,61 @@
+"""Streaming mode (chunked scans of a `ChunkedTable`, partial aggregates)
+must return what the in‑memory run over the same rows returns."""
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from dsl import ChunkedTable, Runner
+
+
+@pytest.fixture
+def tables(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 3000
+    df = pd.DataFrame({
+        "member_id": rng.integers(0, 400, n),
+        "party": rng.choice(["Lab", "Con", "LD"], n),
+        "text": rng.choice(["rental income", "israel", "budget", ""], n),
+        "x": rng.normal(size=n).round(6),
+    })
+    paths = []
+    for i, lo in enumerate(range(0, n, 1000)):   # several files, one table
+        paths.append(str(tmp_path / f"contrib_{i}.csv"))
+        df.iloc[lo:lo + 1000].to_csv(paths[-1], index=False)
+    members = pd.DataFrame({"member_id": np.arange(400), "region": [f"r{i % 7}" for i in range(400)]})
+    in_memory = pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+    return ({"contrib": ChunkedTable(paths), "members": members},
+            {"contrib": in_memory, "members": members})
+
+
+STEPS = [
+    {"id": "s", "op": "source", "table": "contrib"},
+    {"id": "f", "op": "filter", "input": "s",
+     "conditions": [{"lhs": "x", "op": ">", "rhs": -1},
+                    {"lhs": "text", "op": "noticontains", "rhs": "budget"}]},
+    {"id": "m", "op": "mutate", "input": "f",
+     "cols": {"y": {"op": "mul", "args": [{"var": "x"}, {"const": 2}]}}},
+    # many groups and small chunks: partials are re-combined along the way
+    {"id": "a", "op": "aggregate", "input": "m", "group": ["member_id", "party"],
+     "metrics": {"n": {"fn": "count", "col": "y"}, "s": {"fn": "sum", "col": "y"},
+                 "lo": {"fn": "min", "col": "x"}, "hi": {"fn": "max", "col": "x"},
+                 "avg": {"fn": "mean", "col": "y"}}},
+    {"id": "med", "op": "aggregate", "input": "m", "group": ["party"],   # collects first
+     "metrics": {"med": {"fn": "median", "col": "x"}}},
+    {"id": "j", "op": "join", "inputs": ["a", "members"], "on": ["member_id"], "how": "inner"},
+    {"id": "members", "op": "source", "table": "members"},
+    {"id": "r", "op": "aggregate", "input": "j", "group": ["region"],
+     "metrics": {"n": {"fn": "sum", "col": "n"}}},
+]
+
+
+@pytest.mark.parametrize("optimize", [True, False])
+def test_streaming_matches_in_memory(tables, optimize):
+    chunked, in_memory = tables
+    ret = ["m", "a", "med", "r"]
+    got = Runner(steps=STEPS, dfs=chunked, streaming=True, chunk_size=97,
+                 optimize=optimize, max_workers=1).run(ret)
+    want = Runner(steps=STEPS, dfs=in_memory, optimize=optimize, max_workers=1).run(ret)
+    for k in ret:
+        pdt.assert_frame_equal(got[k].reset_index(drop=True), want[k].reset_index(drop=True))
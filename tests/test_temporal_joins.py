@@ -0,0 +1,73 @@
+"""interval_join / asof_join against brute force: a key merge plus an
+interval filter, and pd.merge_asof on the rows with usable keys/times."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dsl import asof_join, interval_join, run_pipeline
+
+
+def _frames(seed=0, n=300, m=80):
+    rng = np.random.default_rng(seed)
+    k = rng.integers(0, 6, n).astype(float)
+    k[rng.random(n) < 0.05] = np.nan
+    t = rng.normal(size=n)
+    t[rng.random(n) < 0.05] = np.nan
+    left = pd.DataFrame({"k": k, "t": t, "i": np.arange(n)})
+    start = rng.normal(size=m)
+    end = start + rng.exponential(size=m)
+    start[rng.random(m) < 0.1] = np.nan
+    end[rng.random(m) < 0.1] = np.nan
+    right = pd.DataFrame({"k": rng.integers(0, 6, m).astype(float), "start": start,
+                          "end": end, "rt": rng.normal(size=m), "j": np.arange(m)})
+    return left, right
+
+
+def _pairs(out):
+    return sorted(zip(out["i"], out["j"].fillna(-1).astype(int)))
+
+
+def _with_unmatched(pairs, n):
+    seen = {i for i, _ in pairs}
+    return sorted(pairs + [(i, -1) for i in range(n) if i not in seen])
+
+
+@pytest.mark.parametrize("closed", ["both", "left", "right", "neither"])
+@pytest.mark.parametrize("how", ["left", "inner"])
+def test_interval_join_matches_merge_and_filter(closed, how):
+    left, right = _frames()
+    got = interval_join(left, right, ["k"], "t", "start", "end", how=how, closed=closed)
+    assert (np.diff(got["i"]) >= 0).all()          # left row order kept
+    m = left.merge(right.dropna(subset=["k"]), on="k")
+    lo, hi = m["start"].fillna(-np.inf), m["end"].fillna(np.inf)
+    ok = ((m["t"] >= lo) if closed in ("both", "left") else (m["t"] > lo)) & \
+         ((m["t"] <= hi) if closed in ("both", "right") else (m["t"] < hi))
+    want = sorted(zip(m.loc[ok, "i"], m.loc[ok, "j"]))
+    assert _pairs(got) == (_with_unmatched(want, len(left)) if how == "left" else want)
+
+
+@pytest.mark.parametrize("direction", ["backward", "forward", "nearest"])
+def test_asof_join_matches_merge_asof(direction):
+    left, right = _frames(1)
+    got = asof_join(left, right, ["k"], "t", "rt", direction=direction)
+    assert got["i"].tolist() == list(range(len(left)))
+    l = left.dropna(subset=["k", "t"]).sort_values("t")
+    r = right.dropna(subset=["k", "rt"]).sort_values("rt")
+    hit = pd.merge_asof(l, r, left_on="t", right_on="rt", by="k",
+                        direction=direction).dropna(subset=["j"])
+    want = list(zip(hit["i"], hit["j"].astype(int)))
+    assert _pairs(got) == _with_unmatched(want, len(left))
+
+
+def test_float_columns_of_base_tables_untouched():
+    left, right = _frames(2)
+    before = right.copy()
+    out = run_pipeline({"steps": [
+        {"id": "l", "op": "source", "table": "left"},
+        {"id": "r", "op": "source", "table": "right"},
+        {"id": "j", "op": "interval_join", "inputs": ["l", "r"], "on": ["k"],
+         "left_on": "t", "start": "start", "end": "end"},
+    ]}, {"left": left, "right": right})
+    assert len(out["j"]) >= len(left)
+    pd.testing.assert_frame_equal(right, before)
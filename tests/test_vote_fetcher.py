@@ -0,0 +1,89 @@
+"""VoteFetcher against a local stub of the votes APIs: cold fetch, on‑disk
+cache hits and HTTP errors."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from dsl import VoteFetcher
+
+DIVISIONS = {
+    1: {"Ayes": [{"MemberId": 10}, {"MemberId": 11}], "Noes": [{"MemberId": 12}],
+        "NoVoteRecorded": []},
+    2: {"Ayes": [], "Noes": [{"MemberId": 10}], "NoVoteRecorded": [{"MemberId": 13}]},
+}
+
+
+@pytest.fixture
+def api():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            house, div_id = self.path.strip("/").split("/")
+            js = DIVISIONS.get(int(div_id))
+            if js is None:
+                self.send_response(500); self.end_headers(); return
+            if house == "lords":
+                js = {"Division": js}
+            body = json.dumps(js).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    yield base, hits
+    server.shutdown()
+    server.server_close()
+
+
+def _fetcher(api, cache_dir):
+    base, _ = api
+    return VoteFetcher(commons_api=base + "/commons/{id}", lords_api=base + "/lords/{id}",
+                       cache_dir=str(cache_dir), max_workers=2, retries=1, timeout=5)
+
+
+def test_cold_fetch(api, tmp_path):
+    _, hits = api
+    got = _fetcher(api, tmp_path).fetch_many([1, 2, 1], house=1)
+    assert sorted(hits) == ["/commons/1", "/commons/2"]
+    assert got[1]["member_id"].tolist() == [10, 11, 12]
+    assert got[1]["vote"].tolist() == ["AYE", "AYE", "NO"]
+    assert got[2]["vote"].tolist() == ["NO", "NOTREC"]
+    assert (tmp_path / "1_1.json").exists() and (tmp_path / "1_2.json").exists()
+
+
+def test_lords_payload(api, tmp_path):
+    got = _fetcher(api, tmp_path).fetch(1, house=2)
+    assert got["member_id"].tolist() == [10, 11, 12]
+
+
+def test_disk_cache_hit(api, tmp_path):
+    _, hits = api
+    _fetcher(api, tmp_path).fetch(1, house=1)
+    fresh = _fetcher(api, tmp_path)        # new process: empty memory cache
+    assert fresh.is_cached(1, 1) and not fresh.is_cached(2, 1)
+    got = fresh.fetch(1, house=1)
+    assert hits == ["/commons/1"]
+    assert got["vote"].tolist() == ["AYE", "AYE", "NO"]
+    got["vote"] = "X"                      # callers get a copy, not the cache
+    assert fresh.fetch(1, house=1)["vote"].tolist() == ["AYE", "AYE", "NO"]
+
+
+def test_error_propagates(api, tmp_path):
+    vf = _fetcher(api, tmp_path)
+    with pytest.raises(requests.HTTPError):
+        vf.fetch_many([1, 99], house=1)
+    assert not vf.is_cached(99, 1)
+    assert not (tmp_path / "1_99.json").exists()
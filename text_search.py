@@ -0,0 +1,294 @@
+"""Fast string predicates for the DSL filters.
+
+* `compile_pattern` – compiled regexes, cached per (pattern, case) so a
+  pattern is compiled once per process rather than once per request.
+* `match_many`      – evaluates several patterns against one column in a
+  single pass over the strings, returning one boolean mask per pattern.
+  Patterns that are plain literals are checked with ``in`` (on a case‑folded
+  copy of the string for case‑insensitive ones) instead of the regex engine.
+
+* `TrigramIndex`    – optional n‑gram index over a base‑table text column;
+  reduces regex/substring predicates to a candidate row set that is then
+  verified with the real pattern.  Patterns without a usable literal fall
+  back to a full scan.
+
+`match_many` reproduces ``Series.str.contains(pat, case=..., na=False)``:
+non‑string values never match.
+"""
+
+import re
+import weakref
+try:
+    import re._parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+from functools import lru_cache, reduce
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# patterns that can't be safely OR‑ed into one regex (group numbers shift)
+_UNCOMBINABLE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+# above this share of candidate rows a plain scan is cheaper than the index
+_INDEX_MAX_FRACTION = 0.5
+
+
+
+def fold(text: str) -> str:
+    """Lower‑case *text* char for char.  With ſ/ı/İ mapped first, a character
+    folds onto an ASCII letter exactly when re.IGNORECASE would match it to
+    that letter."""
+    if text.isascii():
+        return text.lower()
+    return text.replace("ſ", "s").replace("ı", "i").replace("İ", "i").lower()
+
+
+@lru_cache(maxsize=1024)
+def literal(pattern: str, ignore_case: bool = False) -> Optional[str]:
+    """The string *pattern* matches literally, or None if it uses any regex
+    syntax.  Case‑insensitive literals must be ASCII (see `fold`)."""
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except re.error:
+        return None
+    if parsed.state.flags & (re.IGNORECASE | re.VERBOSE) or \
+            any(op is not _sre_parse.LITERAL for op, _ in parsed):
+        return None
+    lit = "".join(chr(c) for _, c in parsed)
+    if ignore_case:
+        return lit.lower() if lit.isascii() else None
+    return lit
+
+
+@lru_cache(maxsize=1024)
+def compile_pattern(pattern: str, ignore_case: bool = False) -> re.Pattern:
+    return re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+
+
+@lru_cache(maxsize=256)
+def _combined(patterns: Tuple[str, ...], ignore_case: bool) -> Optional[re.Pattern]:
+    """One alternation matching wherever *any* of *patterns* matches, used
+    to skip strings no pattern can match.  None if they can't be combined."""
+    if any(_UNCOMBINABLE.search(p) for p in patterns):
+        return None
+    try:
+        return re.compile("|".join(f"(?:{p})" for p in patterns),
+                          re.IGNORECASE if ignore_case else 0)
+    except re.error:
+        return None
+
+
+def supports(series: pd.Series) -> bool:
+    """True for columns `match_many` handles itself: object, ``str`` /
+    ``string`` (pandas 3's default for text) and categoricals.  Other dtypes
+    are left to ``Series.str``."""
+    return pd.api.types.is_string_dtype(series.dtype) or \
+        isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def match_many(series: pd.Series, specs: Sequence[Tuple[str, bool]],
+               index: Optional["TrigramIndex"] = None) -> List[np.ndarray]:
+    """Boolean mask per ``(pattern, ignore_case)`` in *specs*, in one pass.
+    With an *index* for *series*, only the candidate rows are scanned."""
+    if index is not None:
+        cands = [index.candidates(p, ic) for p, ic in specs]
+        rows = reduce(np.union1d, cands) if all(c is not None for c in cands) else None
+        if rows is not None and len(rows) <= _INDEX_MAX_FRACTION * len(series):
+            out = np.zeros((len(specs), len(series)), dtype=bool)
+            out[:, rows] = match_many(series.iloc[rows], specs)
+            return list(out)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        cats = match_many(pd.Series(series.cat.categories, dtype=object), specs)
+        codes = series.cat.codes.to_numpy()
+        return [np.append(m, False)[codes] for m in cats]  # code -1 → False
+    values = series.to_numpy(dtype=object, copy=False)
+    out = np.zeros((len(specs), len(values)), dtype=bool)
+    lits = [(j, literal(p, ic), ic) for j, (p, ic) in enumerate(specs)]
+    exact = [(j, l) for j, l, ic in lits if l is not None and not ic]
+    folded = [(j, l) for j, l, ic in lits if l is not None and ic]
+    regexes = [(j, compile_pattern(*specs[j])) for j, l, _ in lits if l is None]
+    pre = [_combined(tuple(specs[j][0] for j, _ in regexes if specs[j][1] == flag), flag)
+           for flag in {specs[j][1] for j, _ in regexes}]
+    if len(regexes) < 2 or any(c is None for c in pre):
+        pre = []
+    for i, x in enumerate(values):
+        if not isinstance(x, str):
+            continue
+        for j, l in exact:
+            if l in x:
+                out[j, i] = True
+        if folded:
+            xf = fold(x)
+            for j, l in folded:
+                if l in xf:
+                    out[j, i] = True
+        if regexes and not (pre and not any(c.search(x) for c in pre)):
+            for j, p in regexes:
+                if p.search(x) is not None:
+                    out[j, i] = True
+    return list(out)
+
+
+# ---------------------------------------------------------------------------
+# Trigram index
+# ---------------------------------------------------------------------------
+def _trigram_codes(chars: np.ndarray) -> np.ndarray:
+    c = chars.astype(np.uint64)
+    return (c[:-2] << np.uint64(42)) | (c[1:-1] << np.uint64(21)) | c[2:]
+
+
+class TrigramIndex:
+    """Inverted index from each trigram of the `fold`‑ed text to the sorted
+    row positions containing it.
+
+    `candidates` narrows a regex to the rows that can possibly match; callers
+    must still run the real pattern on those rows.  Null cells are indexed
+    as "" and other non‑strings as ``str(x)``, so the candidate set is a
+    superset for both `match_many` and ``astype(str).str.contains``."""
+
+    def __init__(self, values: Sequence, chunk_rows: int = 20_000):
+        self.n = len(values)
+        codes, rows = [], []
+        for lo in range(0, self.n, chunk_rows):
+            docs = [x if isinstance(x, str) else ("" if pd.isna(x) else str(x))
+                    for x in values[lo:lo + chunk_rows]]
+            # "\0" separates documents; trigrams spanning it are dropped.
+            # `fold` maps char for char, so folding the joined text is safe.
+            chars = np.frombuffer(fold("\0".join(docs)).encode("utf-32-le"), dtype=np.uint32)
+            if len(chars) < 3:
+                continue
+            doc = np.repeat(np.arange(lo, lo + len(docs), dtype=np.int64),
+                            [len(d) + 1 for d in docs])[:len(chars)]
+            ok = (chars[:-2] != 0) & (chars[1:-1] != 0) & (chars[2:] != 0)
+            c, r = _dedupe(_trigram_codes(chars)[ok], doc[:-2][ok])
+            codes.append(c); rows.append(r)
+        c = np.concatenate(codes or [np.empty(0, np.uint64)])
+        r = np.concatenate(rows or [np.empty(0, np.int64)])
+        order = np.argsort(c, kind="stable")  # chunks hold disjoint, ascending rows
+        c, r = c[order], r[order]
+        starts = np.flatnonzero(np.r_[True, c[1:] != c[:-1]]) if len(c) else np.empty(0, np.int64)
+        self.codes = c[starts]
+        self.offsets = np.append(starts, len(c))
+        self.rows = r.astype(np.int32 if self.n < 2**31 else np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.offsets.nbytes + self.rows.nbytes
+
+    def _posting(self, code) -> np.ndarray:
+        i = np.searchsorted(self.codes, code)
+        if i == len(self.codes) or self.codes[i] != code:
+            return self.rows[:0]
+        return self.rows[self.offsets[i]:self.offsets[i + 1]]
+
+    def rows_with(self, lit: str) -> np.ndarray:
+        """Rows whose folded text contains every trigram of folded *lit*."""
+        chars = np.frombuffer(fold(lit).encode("utf-32-le"), dtype=np.uint32)
+        postings = sorted((self._posting(c) for c in set(_trigram_codes(chars).tolist())), key=len)
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), postings)
+
+    def candidates(self, pattern: str, ignore_case: bool = False) -> Optional[np.ndarray]:
+        """Sorted row positions that may match *pattern*, or None if the
+        pattern has no usable literal (then every row is a candidate)."""
+        try:
+            parsed = _sre_parse.parse(pattern)
+        except re.error:
+            return None
+        return self._eval(_required(parsed, ignore_case or bool(parsed.state.flags & re.I)))
+
+    def _eval(self, req) -> Optional[np.ndarray]:
+        if req is None:
+            return None
+        kind, arg = req
+        if kind == "lit":
+            return self.rows_with(arg)
+        parts = [self._eval(r) for r in arg]
+        if kind == "or":
+            if any(p is None for p in parts):
+                return None
+            return reduce(np.union1d, parts)
+        parts = sorted((p for p in parts if p is not None), key=len)
+        if not parts:
+            return None
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), parts)
+
+
+def _dedupe(codes: np.ndarray, rows: np.ndarray):
+    """Unique (code, row) pairs sorted by code then row; *rows* must already
+    be ascending (they are: documents are laid out in order)."""
+    order = np.argsort(codes, kind="stable")
+    codes, rows = codes[order], rows[order]
+    keep = np.ones(len(codes), dtype=bool)
+    keep[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+    return codes[keep], rows[keep]
+
+
+_REPEATS = {_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT,
+            getattr(_sre_parse, "POSSESSIVE_REPEAT", _sre_parse.MAX_REPEAT)}
+
+
+def _required(parsed, ignore_case: bool):
+    """Literal strings any match of *parsed* must contain, as a tree of
+    ``("lit", s)`` / ``("and", [...])`` / ``("or", [...])``; None = nothing."""
+    reqs, run = [], []
+
+    def flush():
+        if len(run) >= 3:
+            reqs.append(("lit", "".join(run)))
+        run.clear()
+
+    for op, av in parsed:
+        if op is _sre_parse.LITERAL:
+            ch = chr(av)
+            if ch != "\0" and (ch.isascii() or not ignore_case):
+                run.append(ch); continue
+            flush()
+        elif op is _sre_parse.AT:  # anchors consume nothing
+            continue
+        elif op is _sre_parse.SUBPATTERN:
+            flush()
+            _, add, rem, sub = av
+            reqs.append(_required(sub, (ignore_case or bool(add & re.I)) and not rem & re.I))
+        elif op is _sre_parse.BRANCH:
+            flush()
+            alts = [_required(b, ignore_case) for b in av[1]]
+            reqs.append(None if any(a is None for a in alts) else ("or", alts))
+        elif op in _REPEATS:
+            flush()
+            if av[0] >= 1:
+                reqs.append(_required(av[2], ignore_case))
+        elif op is getattr(_sre_parse, "ATOMIC_GROUP", None):
+            flush()
+            reqs.append(_required(av, ignore_case))
+        else:
+            flush()
+    flush()
+    reqs = [r for r in reqs if r is not None]
+    if not reqs:
+        return None
+    return reqs[0] if len(reqs) == 1 else ("and", reqs)
+
+
+_INDEXES: Dict[Tuple[int, str], tuple] = {}   # (id(df), col) -> (weakref, index)
+
+
+def build_index(df: pd.DataFrame, column: str) -> TrigramIndex:
+    """Build and register a trigram index for *df[column]*."""
+    ix = TrigramIndex(df[column].to_numpy(dtype=object))
+    key = (id(df), column)
+
+    def _drop(ref, key=key):
+        if _INDEXES.get(key, (None,))[0] is ref:
+            del _INDEXES[key]
+
+    _INDEXES[key] = (weakref.ref(df, _drop), ix)
+    return ix
+
+
+def index_for(df: pd.DataFrame, column: str) -> Optional[TrigramIndex]:
+    """The index built for exactly this frame object (row positions only
+    line up with the frame it was built from, never with derived frames)."""
+    ent = _INDEXES.get((id(df), column))
+    return ent[1] if ent is not None and ent[0]() is df else None